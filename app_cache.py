@@ -0,0 +1,65 @@
+import threading
+
+import streamlit as st
+
+# A live Google Fit sync is a network round trip per chunk; run it at most
+# this often per user. Reads are keyed by data version and recomputed as
+# soon as a sync or a logged meal bumps it, so their TTLs only bound memory.
+FIT_TTL_SECONDS = 15 * 60
+MEAL_TTL_SECONDS = 60 * 60
+MAX_CACHED_ENTRIES = 256
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def data_version(user_id, kind):
+    """Current version of a user's 'fit' or 'meals' data (part of cache keys)"""
+    with _versions_lock:
+        return _versions.get((user_id, kind), 0)
+
+
+def invalidate(user_id, kind):
+    """Bump a data version so cached reads of that data are recomputed
+
+    Call after a meal is logged or cleared ('meals') and after a Google Fit
+    sync writes new days ('fit'). Old entries are never hit again and age
+    out with their TTL.
+    """
+    with _versions_lock:
+        _versions[(user_id, kind)] = _versions.get((user_id, kind), 0) + 1
+
+
+@st.cache_resource(show_spinner=False)
+def get_food_api():
+    """One LogMeal client per process, with its connection pool and caches"""
+    # requests/PIL stack only loads once live mode actually needs it
+    from logmeal_api import LogMealAPI
+    return LogMealAPI()
+
+
+@st.cache_data(ttl=FIT_TTL_SECONDS, max_entries=MAX_CACHED_ENTRIES, show_spinner=False)
+def throttled_fit_sync(user_id, start_day, end_day, _sync):
+    """Run _sync() - a live Google Fit sync - at most once per TTL per key
+
+    The sync bumps the 'fit' version itself, so it can't be keyed by it.
+    Exceptions aren't cached: a failed sync is retried on the next rerun
+    instead of leaving demo data standing in for the whole TTL.
+    """
+    return _sync()
+
+
+@st.cache_data(ttl=FIT_TTL_SECONDS, max_entries=MAX_CACHED_ENTRIES, show_spinner=False)
+def cached_fit_data(name, user_id, start_day, end_day, version, _load):
+    """Result of _load() for fitness/sleep data, cached per key
+
+    name, user_id, the start_day..end_day range and version form the key;
+    _load isn't hashed, so name must identify what it computes.
+    """
+    return _load()
+
+
+@st.cache_data(ttl=MEAL_TTL_SECONDS, max_entries=MAX_CACHED_ENTRIES, show_spinner=False)
+def cached_meal_data(name, user_id, start_day, end_day, version, _load):
+    """Result of _load() for meal log data, cached per key (see cached_fit_data)"""
+    return _load()
@@ -0,0 +1,231 @@
+import asyncio
+
+import aiohttp
+import streamlit as st
+
+from image_prep import prepare_image_for_upload
+from logmeal_api import LogMealAPI, resolve_base_url
+from nutrition_cache import get_nutrition_cache
+from rate_limit import RateLimitExceeded, api_key_bucket, get_rate_limiter, retry_after_seconds
+from recognition_cache import get_recognition_cache
+from single_flight import get_single_flight
+
+
+class AsyncLogMealAPI:
+    """asyncio-native LogMeal client
+
+    Mirrors LogMealAPI.analyze_food_image - same result dict and fallback -
+    but runs on an event loop: one aiohttp connection pool, concurrent
+    nutrition lookups, and a semaphore capping in-flight LogMeal calls so
+    many users can be served from one loop. Calls draw on the same per-key
+    rate limit and coalesce with the same in-flight requests as LogMealAPI.
+    """
+
+    # Same result, totals, confidence and fallback shape as the sync client
+    build_analysis_result = LogMealAPI.build_analysis_result
+    total_nutrition = LogMealAPI.total_nutrition
+    calculate_confidence = LogMealAPI.calculate_confidence
+    get_fallback_nutrition = LogMealAPI.get_fallback_nutrition
+
+    def __init__(self, max_concurrency=10, pool_size=20, recognition_timeout=30,
+                 nutrition_timeout=15, nutrition_deadline=20,
+                 nutrition_cache=None, recognition_cache=None,
+                 max_image_edge=1024, jpeg_quality=85, base_url=None,
+                 rate_limiter=None, single_flight=None):
+        self.api_key = st.secrets["LOGMEAL_API_KEY"]  # Set in .streamlit/secrets.toml
+        self.base_url = resolve_base_url(base_url)
+
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self.recognition_timeout = recognition_timeout
+        self.nutrition_timeout = nutrition_timeout
+        self.nutrition_deadline = nutrition_deadline
+
+        self.nutrition_cache = nutrition_cache or get_nutrition_cache()
+        self.recognition_cache = recognition_cache or get_recognition_cache()
+        self.max_image_edge = max_image_edge
+        self.jpeg_quality = jpeg_quality
+
+        # Shared with the sync client: one token bucket per API key, one
+        # request per photo or food_id in flight
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.rate_limit_bucket = api_key_bucket('logmeal', self.api_key)
+        self.single_flight = single_flight or get_single_flight()
+
+        # Bound to the running loop, so created on first use
+        self.session = None
+        self.semaphore = None
+
+    async def __aenter__(self):
+        await self.get_session()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def get_session(self):
+        """Return the keep-alive aiohttp session, creating it inside the loop"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size,
+                keepalive_timeout=30
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                headers={'Authorization': f'Bearer {self.api_key}'}
+            )
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self.session
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    async def analyze_food_image(self, image_bytes):
+        """Main function to analyze food from image"""
+        try:
+            return await self.run_food_analysis(image_bytes)
+        except RateLimitExceeded:
+            raise  # Backpressure for the caller to show - not fallback data
+        except Exception:
+            return self.get_fallback_nutrition()
+
+    async def run_food_analysis(self, image_bytes):
+        """Recognize foods and total their nutrition, raising on API failure"""
+        # Step 1: Food Recognition
+        recognition_data = await self.recognize_food(image_bytes)
+
+        # Step 2: Get Nutrition Data
+        food_nutrition = await self.fetch_nutrition_facts(
+            recognition_data.get('recognition_results', [])
+        )
+
+        return self.build_analysis_result(recognition_data, food_nutrition)
+
+    async def analyze_food_images(self, images):
+        """Analyze several images concurrently, results in input order"""
+        return await asyncio.gather(
+            *(self.analyze_food_image(image_bytes) for image_bytes in images)
+        )
+
+    async def recognize_food(self, image_bytes):
+        """Run food recognition, served from cache for repeated images"""
+        cache_key = self.recognition_cache.make_key(image_bytes)
+        recognition_data = self.recognition_cache.get(cache_key)
+        if recognition_data is not None:
+            return recognition_data
+
+        return await self.single_flight.do_async(
+            ('recognition', self.base_url, cache_key.digest),
+            self.request_recognition, image_bytes, cache_key
+        )
+
+    async def request_recognition(self, image_bytes, cache_key):
+        """Upload a photo to /recognition/complete and cache the response"""
+        await self.acquire_rate_limit()
+
+        # Decoding and re-encoding is CPU work - keep it off the event loop
+        upload_bytes, _ = await asyncio.to_thread(
+            prepare_image_for_upload, image_bytes,
+            max_edge=self.max_image_edge, quality=self.jpeg_quality
+        )
+
+        form = aiohttp.FormData()
+        form.add_field('image', upload_bytes, filename='meal.jpg', content_type='image/jpeg')
+
+        session = await self.get_session()
+        async with self.semaphore:
+            async with session.post(
+                f"{self.base_url}/recognition/complete",
+                data=form,
+                timeout=aiohttp.ClientTimeout(total=self.recognition_timeout)
+            ) as response:
+                if response.status == 429:
+                    raise RateLimitExceeded(retry_after_seconds(response))
+                if response.status != 200:
+                    raise Exception(f"LogMeal API error: {response.status}")
+                recognition_data = await response.json()
+
+        self.recognition_cache.put(cache_key, recognition_data)
+        return recognition_data
+
+    async def get_nutrition_details(self, recognition_data):
+        """Get detailed nutrition for recognized foods"""
+        foods = recognition_data.get('recognition_results', [])
+        return self.total_nutrition(foods, await self.fetch_nutrition_facts(foods))
+
+    async def fetch_nutrition_facts(self, foods):
+        """Nutrition facts per recognized food, in order; None where LogMeal has none
+
+        Looked up concurrently. Raises if any lookup failed or missed the
+        deadline - a partial total would understate the meal.
+        """
+        if not foods:
+            return []
+
+        tasks = [
+            asyncio.ensure_future(self.fetch_food_nutrition(food.get('food_id', '')))
+            for food in foods
+        ]
+
+        # Lookups still running at the deadline are cancelled
+        done, pending = await asyncio.wait(tasks, timeout=self.nutrition_deadline)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise TimeoutError(f"Not finished within {self.nutrition_deadline}s")
+
+        # Prefer the error that says when to retry
+        failed = [task.exception() for task in tasks if task.exception() is not None]
+        backpressure = [e for e in failed if isinstance(e, RateLimitExceeded)]
+        if backpressure:
+            raise max(backpressure, key=lambda e: e.retry_after)
+        if failed:
+            raise failed[0]
+
+        return [task.result() for task in tasks]
+
+    async def fetch_food_nutrition(self, food_id):
+        """Nutrition facts for a single food, None for an unknown food, raises on server errors"""
+        # The nutrition cache falls through to SQLite - a disk read and a
+        # commit must not stall every other request on the loop
+        cached = await asyncio.to_thread(self.nutrition_cache.get, food_id) if food_id else None
+        if cached is not None:
+            return cached
+
+        return await self.single_flight.do_async(
+            ('nutrition', self.base_url, food_id), self.request_food_nutrition, food_id
+        )
+
+    async def request_food_nutrition(self, food_id):
+        """Rate-limited nutrition request; caches the facts it gets"""
+        await self.acquire_rate_limit()
+
+        session = await self.get_session()
+        async with self.semaphore:
+            async with session.get(
+                f"{self.base_url}/nutrition/recipe/nutritionalInfo",
+                params={'food_id': food_id},
+                timeout=aiohttp.ClientTimeout(total=self.nutrition_timeout)
+            ) as response:
+                if response.status == 429:
+                    raise RateLimitExceeded(retry_after_seconds(response))
+                if response.status >= 500:
+                    raise Exception(f"LogMeal API error: {response.status}")
+                if response.status != 200:
+                    return None
+                nutrition = await response.json()
+
+        if food_id:
+            await asyncio.to_thread(self.nutrition_cache.put, food_id, nutrition)
+        return nutrition
+
+    async def acquire_rate_limit(self):
+        """Take a token from the API key's bucket, raising RateLimitExceeded
+
+        The limiter may sleep for a refill and writes SQLite, so it runs in
+        a worker thread.
+        """
+        await asyncio.to_thread(self.rate_limiter.acquire, self.rate_limit_bucket)
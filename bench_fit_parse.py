@@ -0,0 +1,169 @@
+"""Peak memory and parse time of the streaming Google Fit aggregate parser
+
+Builds a synthetic dataset.aggregate response with --days daily buckets
+and --points points per dataset (per-minute pulls have ~1440), then
+compares:
+  legacy    json.loads + the per-point substring loop parse_daily_buckets ran
+  dict      json.loads + fit_parse.parse_aggregate_response
+  stream    DailyAccumulator.feed on the raw bytes (ijson, bucket at a time)
+
+    python bench_fit_parse.py --days 90 --points 1440
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from datetime import time as day_time
+
+from fit_parse import DailyAccumulator, ijson, parse_aggregate_response
+
+DAY_MILLIS = 86400000
+
+DATA_SOURCES = [
+    ('derived:com.google.step_count.delta:com.google.android.gms:estimated_steps', 'intVal'),
+    ('derived:com.google.calories.expended:com.google.android.gms:merge_calories_expended', 'fpVal'),
+    ('derived:com.google.active_minutes:com.google.android.gms:merge_active_minutes', 'intVal'),
+    ('derived:com.google.heart_rate.bpm:com.google.android.gms:merge_heart_rate_bpm', 'fpVal'),
+    ('derived:com.google.sleep.segment:com.google.android.gms:merged', 'intVal')
+]
+
+
+def make_response(days, points, seed=0):
+    rng = random.Random(seed)
+    start_day = date.today() - timedelta(days=days)
+    start_millis = int(datetime.combine(start_day, day_time.min).timestamp() * 1000)
+
+    buckets = []
+    for day in range(days):
+        bucket_start = start_millis + day * DAY_MILLIS
+        datasets = []
+        for source_id, value_key in DATA_SOURCES:
+            point_list = []
+            for minute in range(points):
+                point_start = (bucket_start + minute * 60000) * 1_000_000
+                value = rng.randint(0, 30) if value_key == 'intVal' else rng.uniform(0.5, 3.0)
+                point_list.append({
+                    'startTimeNanos': str(point_start),
+                    'endTimeNanos': str(point_start + 60_000_000_000),
+                    'dataTypeName': source_id.split(':')[1],
+                    'value': [{value_key: value, 'mapVal': []}]
+                })
+            datasets.append({'dataSourceId': source_id, 'point': point_list})
+        buckets.append({
+            'startTimeMillis': str(bucket_start),
+            'endTimeMillis': str(bucket_start + DAY_MILLIS),
+            'dataset': datasets
+        })
+
+    return json.dumps({'bucket': buckets}).encode('utf-8'), start_millis
+
+
+def legacy_parse_daily_buckets(response):
+    """The per-point loop GoogleFitIntegration.parse_daily_buckets used to run"""
+    daily_rows = []
+
+    for bucket in response.get('bucket', []):
+        date = datetime.fromtimestamp(int(bucket['startTimeMillis']) / 1000).date()
+
+        daily_data = {
+            'date': date.isoformat(),
+            'steps': 0,
+            'calories': 0,
+            'active_minutes': 0,
+            'heart_rate_avg': 70,
+            'sleep_hours': 7.5
+        }
+
+        for dataset in bucket.get('dataset', []):
+            data_type = dataset.get('dataSourceId', '')
+
+            for point in dataset.get('point', []):
+                if 'step_count' in data_type:
+                    daily_data['steps'] += point['value'][0].get('intVal', 0)
+                elif 'calories' in data_type:
+                    daily_data['calories'] += point['value'][0].get('fpVal', 0)
+                elif 'active_minutes' in data_type:
+                    daily_data['active_minutes'] += point['value'][0].get('intVal', 0)
+                elif 'heart_rate' in data_type:
+                    daily_data['heart_rate_avg'] = point['value'][0].get('fpVal', 70)
+                elif 'sleep' in data_type:
+                    daily_data['sleep_hours'] = (
+                        int(point['endTimeNanos']) - int(point['startTimeNanos'])
+                    ) / (1_000_000_000 * 3600)
+
+        daily_rows.append(daily_data)
+
+    return daily_rows
+
+
+def measure(parse, repeat):
+    """(rows, best seconds, peak traced bytes) for a parse
+
+    Timing runs without tracemalloc, which slows allocation-heavy code a lot.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = parse()
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        parse()
+        return rows, best, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def rows_match(expected, actual):
+    if len(expected) != len(actual):
+        return False
+    return all(
+        row['date'] == other['date'] and all(
+            abs(row[name] - other[name]) < 1e-6 for name in row if name != 'date'
+        )
+        for row, other in zip(expected, actual)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--points', type=int, default=1440,
+                        help="points per dataset per day")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    content, start_millis = make_response(args.days, args.points)
+    end_millis = start_millis + args.days * DAY_MILLIS
+    print(f"response: {args.days} days x {len(DATA_SOURCES)} datasets x {args.points} points, "
+          f"{len(content) / 1e6:.1f} MB of JSON")
+
+    def stream():
+        accumulator = DailyAccumulator(start_millis, end_millis)
+        accumulator.feed(content)
+        return accumulator.to_rows()
+
+    variants = [
+        ('legacy', lambda: legacy_parse_daily_buckets(json.loads(content))),
+        ('dict', lambda: parse_aggregate_response(json.loads(content))),
+        ('stream', stream)
+    ]
+
+    expected = None
+    for name, parse in variants:
+        rows, elapsed, peak = measure(parse, args.repeat)
+        expected = expected or rows
+        print(f"{name:7s} {elapsed * 1000:9.1f} ms  peak {peak / 1e6:8.1f} MB  "
+              f"{'ok' if rows_match(expected, rows) else 'MISMATCH'}")
+
+    if ijson is None:
+        print("ijson is not installed - 'stream' fell back to json.loads")
+    else:
+        print(f"ijson backend: {ijson.backend}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Measure Google Fit client construction latency before and after caching
+
+Compares googleapiclient.discovery.build() - what every data fetch used to
+do - against fit_service.get_fitness_client() on a cold and a warm cache.
+Runs offline: both paths use the discovery document bundled with
+google-api-python-client and dummy, non-expiring credentials.
+
+    python bench_fit_service.py --iterations 50
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+
+import fit_service
+
+
+def make_credentials(index=0):
+    return Credentials(
+        token=f'bench-token-{index}',
+        refresh_token=f'bench-refresh-{index}',
+        client_id='bench-client',
+        client_secret='bench-secret',
+        token_uri='https://oauth2.googleapis.com/token',
+        expiry=datetime.utcnow() + timedelta(hours=1)
+    )
+
+
+def time_calls(func, iterations):
+    samples = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        func(i)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{label:<38} mean {statistics.mean(samples):8.3f} ms   "
+          f"p50 {statistics.median(samples):8.3f} ms   p95 {p95:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    credentials = make_credentials()
+
+    # Before: build() re-reads and re-parses the discovery document each call
+    report("build() per call (before)",
+           time_calls(lambda i: build('fitness', 'v1', credentials=credentials),
+                      args.iterations))
+
+    # Startup: first call parses the document once
+    fit_service.load_fitness_discovery.cache_clear()
+    fit_service.clear_fitness_clients()
+    report("get_fitness_client() cold start",
+           time_calls(lambda i: fit_service.get_fitness_client(credentials), 1))
+
+    # After: a new user builds from the parsed document...
+    report("get_fitness_client() new credential",
+           time_calls(lambda i: fit_service.get_fitness_client(make_credentials(i + 1)),
+                      args.iterations))
+
+    # ...and a returning user reuses the cached service
+    report("get_fitness_client() cached (after)",
+           time_calls(lambda i: fit_service.get_fitness_client(credentials),
+                      args.iterations))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""Throughput benchmark for the vectorized HealthAnalyzer engine
+
+Generates synthetic daily fitness/sleep records and meals for N users and
+reports users scored per second for HealthAnalyzer.score_batch, next to
+the per-user analyze_complete_health_profile path for comparison. Also
+times calculate_health_scores over --score-rows daily rows (1M by
+default) against the scalar dashboard formula, checking they agree.
+
+    python bench_health_analyzer.py --users 10000 --days 30 --score-rows 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from health_analyzer import HealthAnalyzer, calculate_health_scores
+
+
+def make_batch(n_users, days, meals_per_day, seed=0):
+    rng = np.random.default_rng(seed)
+
+    day_users = np.repeat(np.arange(n_users, dtype=np.int64), days)
+    meal_users = np.repeat(np.arange(n_users, dtype=np.int64), days * meals_per_day)
+    n_days, n_meals = len(day_users), len(meal_users)
+
+    fitness = {
+        'user': day_users,
+        'steps': rng.integers(2000, 15000, n_days).astype(np.float64),
+        'active_minutes': rng.integers(5, 120, n_days).astype(np.float64),
+        'calories': rng.integers(1600, 3000, n_days).astype(np.float64)
+    }
+    sleep = {
+        'user': day_users,
+        'duration_hours': rng.uniform(5.0, 10.0, n_days),
+        'quality_estimate': rng.uniform(3.0, 10.0, n_days)
+    }
+    nutrition = {
+        'user': meal_users,
+        'calories': rng.uniform(250, 900, n_meals),
+        'protein': rng.uniform(5, 50, n_meals),
+        'carbs': rng.uniform(20, 110, n_meals),
+        'fat': rng.uniform(5, 45, n_meals),
+        'fiber': rng.uniform(0, 15, n_meals),
+        'sugar': rng.uniform(0, 40, n_meals)
+    }
+    return nutrition, fitness, sleep
+
+
+def to_records(table, rows, fields):
+    return [{field: float(table[field][row]) for field in fields} for row in rows]
+
+
+def scalar_health_score(steps, sleep_hours, active_minutes):
+    """The per-dict formula WellSyncSmartApp.calculate_health_score used to run"""
+    steps_score = min(100, (steps / 10000) * 100)
+    sleep_score = max(0, 100 - abs(sleep_hours - 8) * 12.5)
+    active_score = min(100, (active_minutes / 60) * 100)
+
+    return round((steps_score * 0.4 + sleep_score * 0.4 + active_score * 0.2))
+
+
+def bench_health_scores(rows, repeat):
+    rng = np.random.default_rng(1)
+    steps = rng.integers(0, 20000, rows)
+    sleep_hours = np.round(rng.uniform(3.0, 12.0, rows), 1)
+    active_minutes = rng.integers(0, 150, rows)
+
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        scores = calculate_health_scores(steps, sleep_hours, active_minutes)
+        best = min(best, time.perf_counter() - started)
+
+    print(f"calculate_health_scores: {rows:,} rows in {best * 1000:.1f} ms "
+          f"-> {rows / best:,.0f} rows/s")
+
+    started = time.perf_counter()
+    scalar_scores = [
+        scalar_health_score(s, h, a)
+        for s, h, a in zip(steps.tolist(), sleep_hours.tolist(), active_minutes.tolist())
+    ]
+    elapsed = time.perf_counter() - started
+
+    mismatches = int(np.count_nonzero(scores != np.array(scalar_scores)))
+    print(f"scalar loop: {rows:,} rows in {elapsed * 1000:.1f} ms "
+          f"-> {rows / elapsed:,.0f} rows/s ({mismatches} mismatches)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--meals-per-day', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--loop-users', type=int, default=200,
+                        help="users to score through the per-user dict path")
+    parser.add_argument('--score-rows', type=int, default=1000000,
+                        help="rows for the calculate_health_scores benchmark")
+    args = parser.parse_args()
+
+    analyzer = HealthAnalyzer()
+    nutrition, fitness, sleep = make_batch(args.users, args.days, args.meals_per_day)
+    records = len(fitness['user']) * 2 + len(nutrition['user'])
+
+    best = float('inf')
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        analyzer.score_batch(nutrition, fitness, sleep, n_users=args.users)
+        best = min(best, time.perf_counter() - started)
+
+    print(f"score_batch: {args.users:,} users / {records:,} records in {best * 1000:.1f} ms "
+          f"-> {args.users / best:,.0f} users/s")
+
+    # Per-user dict path for the first few users, for comparison
+    loop_users = min(args.loop_users, args.users)
+    day_rows = args.days
+    meal_rows = args.days * args.meals_per_day
+    profiles = [
+        (
+            to_records(nutrition, range(u * meal_rows, (u + 1) * meal_rows), ['calories', 'protein', 'carbs', 'fat', 'fiber', 'sugar']),
+            to_records(fitness, range(u * day_rows, (u + 1) * day_rows), ['steps', 'active_minutes', 'calories']),
+            to_records(sleep, range(u * day_rows, (u + 1) * day_rows), ['duration_hours', 'quality_estimate'])
+        )
+        for u in range(loop_users)
+    ]
+
+    started = time.perf_counter()
+    for profile in profiles:
+        analyzer.analyze_complete_health_profile(*profile)
+    elapsed = time.perf_counter() - started
+
+    print(f"analyze_complete_health_profile: {loop_users:,} users in {elapsed * 1000:.1f} ms "
+          f"-> {loop_users / elapsed:,.0f} users/s")
+
+    bench_health_scores(args.score_rows, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Import-time profile and cold-start time of the Streamlit entry point
+
+Runs each module import in a fresh interpreter under -X importtime and
+reports the best total plus the heaviest imports it pulled in. Then, in
+fresh processes, times the first run of main.py with Streamlit's AppTest
+harness (module imports, WellSyncSmartApp() and the first rendered frame;
+Streamlit's own import is excluded as harness cost).
+
+    python bench_startup.py --runs 5 --budget-ms 300
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MODULES = ['main', 'logmeal_api', 'food_recognition', 'google_fit_api', 'fitness_integration']
+
+FIRST_FRAME_SCRIPT = """
+import json, time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({main!r}, default_timeout=60)
+started = time.perf_counter()
+at.run()
+print(json.dumps({{
+    'first_frame_ms': (time.perf_counter() - started) * 1000,
+    'exceptions': len(at.exception)
+}}))
+"""
+
+
+def import_profile(module, runs):
+    """(best total ms, [(cumulative ms, name)] for that run) for one import"""
+    best_total, best_entries = None, []
+
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        )
+
+        entries = []
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            entries.append((int(cumulative) / 1000, name[1:].rstrip()))
+
+        total = next(ms for ms, name in reversed(entries) if name.strip() == module)
+        if best_total is None or total < best_total:
+            best_total, best_entries = total, entries
+
+    return best_total, best_entries
+
+
+def heaviest_imports(entries, module, top):
+    """Direct imports of module (one level down), heaviest first"""
+    children = [
+        (ms, name.strip()) for ms, name in entries
+        if name.startswith('  ') and not name.startswith('   ')
+    ]
+    return sorted(children, reverse=True)[:top]
+
+
+def first_frame_times(runs):
+    script = FIRST_FRAME_SCRIPT.format(main=os.path.join(ROOT, 'main.py'))
+    times = []
+
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True, check=True
+        )
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        if report['exceptions']:
+            raise RuntimeError('main.py raised during its first run')
+        times.append(report['first_frame_ms'])
+
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8)
+    parser.add_argument('--budget-ms', type=float, default=None,
+                        help="exit non-zero if the median first frame exceeds this")
+    args = parser.parse_args()
+
+    for module in MODULES:
+        total, entries = import_profile(module, args.runs)
+        print(f"import {module}: {total:.1f} ms")
+        for ms, name in heaviest_imports(entries, module, args.top):
+            print(f"    {ms:8.1f} ms  {name}")
+
+    times = first_frame_times(args.runs)
+    median = statistics.median(times)
+    print(f"main.py first frame: median {median:.1f} ms, "
+          f"min {min(times):.1f} ms over {len(times)} cold starts")
+
+    if args.budget_ms is not None and median > args.budget_ms:
+        print(f"over the {args.budget_ms:.0f} ms startup budget")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+"""End-to-end benchmark suite for the scan, sync and scoring paths
+
+Runs offline against standin_server (no network, reproducible latency):
+  logmeal_analyze            LogMealAPI.analyze_food_image
+  recognizer_analyze         FoodRecognizer.analyze_food_image
+  fit_process_response       GoogleFitIntegration.process_google_fit_response
+  fitness_activity_data      FitnessDataManager.get_activity_data (fetch + parse)
+  health_score               WellSyncSmartApp.calculate_health_score
+  save_meal                  WellSyncSmartApp.save_meal_to_profile
+
+Each case reports throughput, p50/p95/p99 latency and peak traced memory.
+--output writes the results as JSON; --compare checks them against an
+earlier file and exits non-zero on a regression beyond --tolerance.
+bench_baseline.json holds the recorded baseline for the default options.
+Needs LOGMEAL_API_KEY / GOOGLE_CLIENT_* in .streamlit/secrets.toml (any
+value works against the stand-in).
+
+Before timing anything the suite checks that a fixed:N stand-in endpoint
+answers in about N ms over a kept-alive connection; transport overhead
+beyond that (e.g. a Nagle stall) would be charged to every case, so the
+run stops there.
+
+    python bench_suite.py --iterations 200 --output bench.json
+    python bench_suite.py --compare bench_baseline.json
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Stand-in sanity check: keep-alive p50 against a fixed:N endpoint
+CHECK_LATENCY_MS = 20
+CHECK_REQUESTS = 30
+CHECK_TOLERANCE_MS = 5
+
+
+def make_images(count, seed=0):
+    """Distinct small JPEG meal photos, so recognition caching doesn't kick in"""
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    images = []
+    for _ in range(count):
+        image = Image.new('RGB', (320, 240), tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(4):
+            x, y = rng.randrange(280), rng.randrange(200)
+            draw.ellipse((x, y, x + 40, y + 40), fill=tuple(rng.randrange(256) for _ in range(3)))
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=85)
+        images.append(buffer.getvalue())
+    return images
+
+
+def run_case(op, iterations, memory_iterations):
+    """Time op(i) per call, then trace peak memory over a few extra calls"""
+    op(iterations + memory_iterations)  # Warm-up: lazy imports, connections
+
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        call_started = time.perf_counter()
+        op(i)
+        latencies.append(time.perf_counter() - call_started)
+    wall = time.perf_counter() - started
+
+    tracemalloc.start()
+    try:
+        for i in range(memory_iterations):
+            op(iterations + i)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+    return {
+        'iterations': iterations,
+        'throughput_per_s': iterations / wall,
+        'mean_ms': statistics.fmean(latencies) * 1000,
+        'p50_ms': cuts[49] * 1000,
+        'p95_ms': cuts[94] * 1000,
+        'p99_ms': cuts[98] * 1000,
+        'peak_memory_kb': peak / 1024
+    }
+
+
+def stand_in_latency_p50(latency_ms=CHECK_LATENCY_MS, requests=CHECK_REQUESTS):
+    """p50 ms of keep-alive requests to a fixed:latency_ms stand-in endpoint"""
+    from http_session import create_session
+    from standin_server import StandInConfig, StandInServer
+
+    session = create_session()
+    latencies = []
+    with StandInServer(nutrition=StandInConfig(f'fixed:{latency_ms}')) as server:
+        url = f"{server.logmeal_base_url}/nutrition/recipe/nutritionalInfo"
+        session.get(url, params={'food_id': 'warm-up'})
+        for i in range(requests):
+            started = time.perf_counter()
+            session.get(url, params={'food_id': str(i)})
+            latencies.append(time.perf_counter() - started)
+    session.close()
+    return statistics.median(latencies) * 1000
+
+
+def build_cases(server, workdir, args):
+    """name -> (op, iterations) for every benchmarked path"""
+    from google.oauth2.credentials import Credentials
+
+    from fit_service import get_fitness_client
+    from fit_store import FitStore
+    from fitness_integration import FitnessDataManager
+    from food_recognition import FoodRecognizer
+    from google_fit_api import GoogleFitIntegration
+    from logmeal_api import LogMealAPI
+    from main import WellSyncSmartApp
+    from meal_store import MealStore
+    from nutrition_cache import NutritionCache
+    from rate_limit import RateLimiter
+    from recognition_cache import RecognitionCache
+
+    scans = args.iterations + args.memory_iterations + 1  # + warm-up
+    images = make_images(scans)
+
+    # Effectively unthrottled: the suite measures the clients, not the quota
+    rate_limiter = RateLimiter(
+        db_path=os.path.join(workdir, 'rate_limits.sqlite3'), rate=1e6, burst=1e6
+    )
+    logmeal = LogMealAPI(
+        base_url=server.logmeal_base_url,
+        nutrition_cache=NutritionCache(db_path=os.path.join(workdir, 'logmeal_nutrition.sqlite3')),
+        recognition_cache=RecognitionCache(),
+        rate_limiter=rate_limiter
+    )
+    recognizer = FoodRecognizer(
+        base_url=server.logmeal_base_url,
+        nutrition_cache=NutritionCache(db_path=os.path.join(workdir, 'recognizer_nutrition.sqlite3')),
+        recognition_cache=RecognitionCache(),
+        rate_limiter=rate_limiter
+    )
+
+    # Fit parsing runs on one pre-built response; fetching goes over HTTP
+    integration = GoogleFitIntegration(
+        store=FitStore(os.path.join(workdir, 'fit_store.sqlite3')),
+        fit_root_url=server.fit_root_url
+    )
+    today = datetime.now().date()
+    fit_response = server.aggregate_payload(
+        integration.build_aggregate_request(today - timedelta(days=args.fit_days - 1), today),
+        random.Random(0)
+    )
+
+    manager = FitnessDataManager(fit_root_url=server.fit_root_url)
+    manager.credentials, manager.service = get_fitness_client(
+        Credentials(token='bench'), root_url=server.fit_root_url
+    )
+
+    app = WellSyncSmartApp()
+    app.meal_store = MealStore(os.path.join(workdir, 'meals.sqlite3'))
+    health_days = [app.get_demo_health_data() for _ in range(scans)]
+    meals = [app.generate_demo_food_analysis() for _ in range(scans)]
+
+    return {
+        'logmeal_analyze': (lambda i: logmeal.analyze_food_image(images[i]), args.iterations),
+        'recognizer_analyze': (lambda i: recognizer.analyze_food_image(images[i]), args.iterations),
+        'fit_process_response': (
+            lambda i: integration.process_google_fit_response(fit_response), args.iterations
+        ),
+        'fitness_activity_data': (
+            lambda i: manager.get_activity_data(days_back=args.fit_days),
+            max(1, args.iterations // 10)
+        ),
+        'health_score': (lambda i: app.calculate_health_score(health_days[i]), args.iterations),
+        'save_meal': (lambda i: app.save_meal_to_profile(meals[i]), args.iterations)
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print deltas against a baseline; return the names of regressed cases"""
+    regressed = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+
+        p95_change = current['p95_ms'] / previous['p95_ms'] - 1
+        throughput_change = current['throughput_per_s'] / previous['throughput_per_s'] - 1
+        worse = p95_change > tolerance or throughput_change < -tolerance
+        if worse:
+            regressed.append(name)
+
+        print(f"  {name:24s} p95 {p95_change:+7.1%}  throughput {throughput_change:+7.1%}"
+              f"{'  REGRESSION' if worse else ''}")
+    return regressed
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--memory-iterations', type=int, default=10,
+                        help="extra calls per case traced for peak memory")
+    parser.add_argument('--latency', default='lognormal:40:0.4',
+                        help="stand-in latency spec (see standin_server.parse_latency)")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--fit-days', type=int, default=30)
+    parser.add_argument('--points-per-dataset', type=int, default=24)
+    parser.add_argument('--cases', default=None, help="comma-separated subset to run")
+    parser.add_argument('--output', default=None, help="write results JSON here")
+    parser.add_argument('--compare', default=None, help="baseline results JSON")
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    args = parser.parse_args()
+
+    # Bare-mode "missing ScriptRunContext" warnings would drown the results
+    logging.disable(logging.WARNING)
+
+    from standin_server import StandInConfig, StandInServer
+
+    check_p50_ms = stand_in_latency_p50()
+    print(f"stand-in check: fixed:{CHECK_LATENCY_MS} p50 {check_p50_ms:.2f} ms")
+    if abs(check_p50_ms - CHECK_LATENCY_MS) > CHECK_TOLERANCE_MS:
+        print(f"stand-in latency is off by more than {CHECK_TOLERANCE_MS} ms - "
+              f"results would measure the transport, not the clients")
+        sys.exit(2)
+
+    def config():
+        return StandInConfig(args.latency, args.error_rate)
+
+    selected = set(args.cases.split(',')) if args.cases else None
+    results = {}
+
+    with tempfile.TemporaryDirectory() as workdir, StandInServer(
+        recognition=config(), nutrition=config(), fit=config(),
+        points_per_dataset=args.points_per_dataset
+    ) as server:
+        for name, (op, iterations) in build_cases(server, workdir, args).items():
+            if selected and name not in selected:
+                continue
+            results[name] = run_case(op, iterations, args.memory_iterations)
+            result = results[name]
+            print(f"{name:24s} {result['throughput_per_s']:10.1f}/s  "
+                  f"p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  "
+                  f"p99 {result['p99_ms']:8.2f} ms  peak {result['peak_memory_kb']:9.1f} KB")
+
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'stand_in_check_p50_ms': check_p50_ms,
+        'config': {
+            key: getattr(args, key)
+            for key in ('iterations', 'memory_iterations', 'latency', 'error_rate',
+                        'fit_days', 'points_per_dataset')
+        },
+        'results': results
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"vs {args.compare} (commit {baseline.get('commit')}):")
+        if compare(results, baseline['results'], args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+import threading
+import time
+
+import metrics
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+DEFAULT_FAILURE_THRESHOLD = 5    # Consecutive failed or slow calls that trip it
+DEFAULT_SLOW_CALL_SECONDS = 10   # Calls slower than this count as failures
+DEFAULT_RESET_TIMEOUT = 30       # Seconds open before a half-open probe is let through
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling an endpoint whose circuit is open
+
+    retry_after is the number of seconds until the next probe is allowed.
+    """
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is unavailable - circuit open, retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Fail fast on an endpoint after repeated errors or slow responses
+
+    Closed: calls go through; failure_threshold consecutive failures (an
+    exception, or a call slower than slow_call_seconds) open the circuit.
+    Open: calls raise CircuitOpenError immediately. After reset_timeout
+    the circuit goes half-open and lets one probe call through - success
+    closes it, failure opens it for another reset_timeout.
+
+    Each call counts once, when it ends: a slow call that then raises is
+    one failure, not two. A stalled call is therefore only counted once
+    its own timeout fires, and func must not retry internally (e.g. a
+    session with transport retries) or every attempt hides behind one
+    result.
+    """
+
+    def __init__(self, name, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 slow_call_seconds=DEFAULT_SLOW_CALL_SECONDS,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT, excluded=()):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+        self.excluded = excluded  # Exceptions that say nothing about endpoint health
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def call(self, func, *args):
+        """Run func(*args) through the breaker"""
+        probe = self.before_call()
+        started = time.monotonic()
+        try:
+            result = func(*args)
+        except self.excluded:
+            self.release(probe)
+            raise
+        except Exception:
+            self.record_failure(probe)
+            raise
+
+        if time.monotonic() - started > self.slow_call_seconds:
+            self.record_failure(probe)
+        else:
+            self.record_success(probe)
+        return result
+
+    def before_call(self):
+        """Admit or reject a call; returns True if it is the half-open probe"""
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+
+            retry_after = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == OPEN and retry_after <= 0:
+                self.transition(HALF_OPEN)
+
+            if self.state == HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+
+        metrics.increment(metrics.CIRCUIT_REJECTED, circuit=self.name)
+        raise CircuitOpenError(self.name, max(0.0, retry_after))
+
+    def record_success(self, probe=False):
+        with self._lock:
+            self.consecutive_failures = 0
+            if probe:
+                self.probe_in_flight = False
+                self.transition(CLOSED)
+
+    def record_failure(self, probe=False):
+        with self._lock:
+            self.consecutive_failures += 1
+            if probe:
+                self.probe_in_flight = False
+            if probe or (self.state == CLOSED and self.consecutive_failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self.transition(OPEN)
+
+    def release(self, probe=False):
+        """End a call that neither passed nor failed (an excluded exception)"""
+        if probe:
+            with self._lock:
+                self.probe_in_flight = False
+
+    def transition(self, state):
+        # Called with the lock held
+        if state != self.state:
+            self.state = state
+            metrics.increment(metrics.CIRCUIT_TRANSITIONS, circuit=self.name, state=state)
+
+    def reset(self):
+        with self._lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.probe_in_flight = False
+
+
+def get_circuit_breaker(name, **options):
+    """Return the process-wide breaker for an endpoint, creating it on first use
+
+    options are CircuitBreaker arguments and only apply on creation.
+    """
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = _breakers[name] = CircuitBreaker(name, **options)
+    return breaker
@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from fit_service import get_thread_http
+import metrics
+from parallel import imap_bounded
+
+DAY_MILLIS = 86400000
+DEFAULT_CHUNK_DAYS = 30
+DEFAULT_MAX_WORKERS = 4
+
+
+def split_time_range(start_millis, end_millis, chunk_days=DEFAULT_CHUNK_DAYS, tz=None):
+    """Split [start, end) into chunks of whole buckets
+
+    With tz (calendar-period buckets), boundaries step chunk_days of
+    wall-clock time in tz from start, so a chunk spanning a DST change is an
+    hour shorter or longer and no day is split between two chunks. Without
+    tz (fixed durationMillis buckets), they step chunk_days * DAY_MILLIS.
+    Either way the buckets come back identical to an unchunked call.
+    """
+    days = max(1, chunk_days)
+    boundary = datetime.fromtimestamp(start_millis / 1000, tz) if tz else None
+    chunks = []
+
+    chunk_start = start_millis
+    while chunk_start < end_millis:
+        if boundary is None:
+            chunk_end = min(chunk_start + days * DAY_MILLIS, end_millis)
+        else:
+            boundary += timedelta(days=days)
+            chunk_end = min(round(boundary.timestamp() * 1000), end_millis)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end
+
+    return chunks
+
+
+def bucket_time_zone(request_body):
+    """Zone a request's calendar-period buckets follow (UTC if unnamed)
+
+    None for fixed durationMillis buckets, which ignore wall-clock time.
+    """
+    period = request_body.get('bucketByTime', {}).get('period')
+    if period:
+        return ZoneInfo(period.get('timeZoneId') or 'UTC')
+    return None
+
+
+def fetch_aggregate_chunked(service, credentials, request_body,
+                            chunk_days=DEFAULT_CHUNK_DAYS,
+                            max_workers=DEFAULT_MAX_WORKERS):
+    """Run a dataset.aggregate request as concurrent per-chunk calls
+
+    Returns (response, failed_chunks): response holds every chunk's buckets
+    merged in time order, the same shape as one aggregate response;
+    failed_chunks lists {'startTimeMillis', 'endTimeMillis', 'error'} for
+    chunks that could not be fetched. Raises if every chunk failed.
+    """
+    response = {'bucket': []}
+
+    def merge(result):
+        response['bucket'].extend(result.get('bucket', []))
+
+    failed_chunks = run_aggregate_chunks(
+        service, credentials, request_body, merge, chunk_days, max_workers
+    )
+    return response, failed_chunks
+
+
+def stream_aggregate_chunked(service, credentials, request_body, accumulator,
+                             chunk_days=DEFAULT_CHUNK_DAYS,
+                             max_workers=DEFAULT_MAX_WORKERS):
+    """Like fetch_aggregate_chunked, but feeds each chunk into accumulator
+
+    Chunks are requested as raw JSON bytes and handed to accumulator.feed
+    (a fit_parse.DailyAccumulator) as they arrive, so the decoded response
+    tree is never built. Returns failed_chunks.
+    """
+    return run_aggregate_chunks(
+        service, credentials, request_body, accumulator.feed, chunk_days, max_workers,
+        raw=True
+    )
+
+
+def raw_content(resp, content):
+    """postproc that skips JSON decoding and returns the response body"""
+    return content
+
+
+def run_aggregate_chunks(service, credentials, request_body, consume,
+                         chunk_days=DEFAULT_CHUNK_DAYS,
+                         max_workers=DEFAULT_MAX_WORKERS, raw=False):
+    """Execute the chunks of an aggregate request, passing each to consume
+
+    consume runs on the calling thread, in time order.
+    """
+    chunks = split_time_range(
+        int(request_body['startTimeMillis']),
+        int(request_body['endTimeMillis']),
+        chunk_days,
+        bucket_time_zone(request_body)
+    )
+
+    # Build requests up front; they execute on the calling or worker
+    # thread's own http, never the service's shared one
+    requests_by_chunk = []
+    for chunk_start, chunk_end in chunks:
+        chunk_body = dict(request_body, startTimeMillis=chunk_start, endTimeMillis=chunk_end)
+        request = service.users().dataset().aggregate(userId='me', body=chunk_body)
+        if raw:
+            request.postproc = raw_content
+        requests_by_chunk.append((chunk_body, request))
+
+    if len(requests_by_chunk) == 1:
+        # Short windows need no fan-out
+        with metrics.timer(metrics.OUTBOUND_SECONDS, service='google_fit', endpoint='aggregate'):
+            result = requests_by_chunk[0][1].execute(http=get_thread_http(credentials))
+        consume(result)
+        return []
+
+    def execute_chunk(chunk):
+        _, request = chunk
+        with metrics.timer(metrics.OUTBOUND_SECONDS, service='google_fit', endpoint='aggregate'):
+            return request.execute(http=get_thread_http(credentials))
+
+    failed_chunks = []
+    last_error = None
+
+    for _, (chunk_body, _), result, error, _ in imap_bounded(
+        execute_chunk, requests_by_chunk, max_workers=max_workers, ordered=True
+    ):
+        if error is not None:
+            last_error = error
+            failed_chunks.append({
+                'startTimeMillis': chunk_body['startTimeMillis'],
+                'endTimeMillis': chunk_body['endTimeMillis'],
+                'error': str(error)
+            })
+        else:
+            consume(result)
+
+    if chunks and len(failed_chunks) == len(chunks):
+        raise last_error
+
+    return failed_chunks
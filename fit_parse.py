@@ -0,0 +1,164 @@
+import io
+import json
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+STEPS, CALORIES, ACTIVE_MINUTES, HEART_RATE, SLEEP = range(5)
+UNKNOWN_METRIC = -1
+
+# Substrings matched against each dataSourceId, first match wins
+METRIC_FRAGMENTS = [
+    ('step_count', STEPS),
+    ('calories', CALORIES),
+    ('active_minutes', ACTIVE_MINUTES),
+    ('heart_rate', HEART_RATE),
+    ('sleep', SLEEP)
+]
+
+NANOS_PER_HOUR = 1_000_000_000 * 3600
+
+
+@lru_cache(maxsize=256)
+def metric_code(data_source_id):
+    """Metric code for a dataSourceId (resolved once, then cached)"""
+    for fragment, code in METRIC_FRAGMENTS:
+        if fragment in data_source_id:
+            return code
+    return UNKNOWN_METRIC
+
+
+def iter_buckets(source):
+    """Yield aggregate buckets one at a time
+
+    source is a parsed response dict, raw JSON bytes/str, or a binary file
+    object. Raw input is parsed incrementally with ijson when it's
+    installed, so only one bucket is materialized at a time.
+    """
+    if isinstance(source, dict):
+        yield from source.get('bucket', [])
+        return
+
+    if isinstance(source, str):
+        source = source.encode('utf-8')
+
+    if ijson is None:
+        if hasattr(source, 'read'):
+            source = source.read()
+        yield from json.loads(source).get('bucket', [])
+        return
+
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    yield from ijson.items(source, 'bucket.item', use_float=True)
+
+
+class DailyAccumulator:
+    """Preallocated per-day totals for one aggregate request window
+
+    Slots are indexed by calendar date in tz (None = this machine's zone),
+    counted from the day start_millis falls on, so a 23- or 25-hour DST
+    day still fills exactly one slot. Points are summed in locals and
+    written once per bucket.
+    """
+
+    def __init__(self, start_millis, end_millis, tz=None):
+        self.tz = tz
+        self.start_day = self.local_date(int(start_millis))
+        if int(end_millis) > int(start_millis):
+            n_days = (self.local_date(int(end_millis) - 1) - self.start_day).days + 1
+        else:
+            n_days = 0
+
+        self.seen = np.zeros(n_days, dtype=bool)
+        self.steps = np.zeros(n_days, dtype=np.int64)
+        self.calories = np.zeros(n_days, dtype=np.float64)
+        self.active_minutes = np.zeros(n_days, dtype=np.int64)
+        self.heart_rate_avg = np.full(n_days, 70.0)
+        self.sleep_hours = np.full(n_days, 7.5)
+
+    def __len__(self):
+        return len(self.seen)
+
+    def local_date(self, millis):
+        return datetime.fromtimestamp(millis / 1000, self.tz).date()
+
+    def feed(self, source):
+        """Accumulate every bucket in a response (see iter_buckets)"""
+        for bucket in iter_buckets(source):
+            self.add_bucket(bucket)
+
+    def add_bucket(self, bucket):
+        bucket_start = int(bucket['startTimeMillis'])
+        index = (self.local_date(bucket_start) - self.start_day).days
+        if not 0 <= index < len(self.seen):
+            raise ValueError(f"Bucket at {bucket_start} is outside the accumulator window")
+
+        steps = calories = active_minutes = 0
+        heart_rate_avg = self.heart_rate_avg[index]
+        sleep_hours = self.sleep_hours[index]
+
+        for dataset in bucket.get('dataset', []):
+            code = metric_code(dataset.get('dataSourceId', ''))
+            points = dataset.get('point', [])
+
+            if code == STEPS:
+                steps += sum(point['value'][0].get('intVal', 0) for point in points)
+            elif code == CALORIES:
+                calories += sum(point['value'][0].get('fpVal', 0) for point in points)
+            elif code == ACTIVE_MINUTES:
+                active_minutes += sum(point['value'][0].get('intVal', 0) for point in points)
+            elif code == HEART_RATE and points:
+                # Last reading wins, as in parse_daily_buckets
+                heart_rate_avg = points[-1]['value'][0].get('fpVal', 70)
+            elif code == SLEEP and points:
+                last = points[-1]
+                sleep_hours = (
+                    int(last['endTimeNanos']) - int(last['startTimeNanos'])
+                ) / NANOS_PER_HOUR
+
+        self.seen[index] = True
+        self.steps[index] += steps
+        self.calories[index] += calories
+        self.active_minutes[index] += active_minutes
+        self.heart_rate_avg[index] = heart_rate_avg
+        self.sleep_hours[index] = sleep_hours
+
+    def to_rows(self):
+        """Per-day dicts in the shape parse_daily_buckets returns"""
+        indices = np.flatnonzero(self.seen)
+        columns = {
+            'steps': self.steps[indices].tolist(),
+            'calories': self.calories[indices].tolist(),
+            'active_minutes': self.active_minutes[indices].tolist(),
+            'heart_rate_avg': self.heart_rate_avg[indices].tolist(),
+            'sleep_hours': self.sleep_hours[indices].tolist()
+        }
+
+        rows = []
+        for i, day in enumerate(indices.tolist()):
+            row = {'date': (self.start_day + timedelta(days=day)).isoformat()}
+            for name, values in columns.items():
+                row[name] = values[i]
+            rows.append(row)
+        return rows
+
+
+def parse_aggregate_response(response):
+    """Parse an already-loaded aggregate response into per-day rows"""
+    buckets = response.get('bucket', [])
+    if not buckets:
+        return []
+
+    accumulator = DailyAccumulator(
+        min(int(bucket['startTimeMillis']) for bucket in buckets),
+        max(int(bucket['endTimeMillis']) for bucket in buckets)
+    )
+    accumulator.feed(response)
+    return accumulator.to_rows()
@@ -0,0 +1,101 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import metrics
+from ttl_cache import TTLCache
+
+# Refresh access tokens this long before they actually expire
+REFRESH_MARGIN = timedelta(minutes=5)
+
+_clients = TTLCache(max_entries=256, ttl_seconds=3600)
+_refresh_lock = threading.Lock()
+_thread_http = threading.local()
+
+
+@lru_cache(maxsize=1)
+def load_fitness_discovery():
+    """Parse the Fitness v1 discovery document once per process
+
+    Uses the static copy bundled with google-api-python-client, so no
+    network fetch is needed even on a cold start.
+    """
+    from googleapiclient.discovery_cache import get_static_doc
+    return json.loads(get_static_doc('fitness', 'v1'))
+
+
+def credentials_key(credentials):
+    return (credentials.client_id, credentials.refresh_token or credentials.token)
+
+
+def refresh_if_needed(credentials):
+    """Refresh credentials only when missing a token or close to expiry"""
+    needs_refresh = credentials.token is None or (
+        credentials.expiry is not None
+        and credentials.expiry - datetime.utcnow() < REFRESH_MARGIN
+    )
+    if not needs_refresh or not credentials.refresh_token:
+        return False
+
+    with _refresh_lock:
+        # Another thread may have refreshed while we waited
+        if credentials.expiry is not None and credentials.expiry - datetime.utcnow() >= REFRESH_MARGIN:
+            return False
+        from google.auth.transport.requests import Request
+        with metrics.timer(metrics.OUTBOUND_SECONDS, service='google_oauth', endpoint='token_refresh'):
+            credentials.refresh(Request())
+    return True
+
+
+def get_fitness_client(credentials, root_url=None):
+    """Return (credentials, service) for a user, reusing the cached pair
+
+    The service is built from the pre-parsed discovery document once per
+    credential. The cached credentials object is returned so refreshed
+    tokens carry over between calls. root_url (or $GOOGLE_FIT_ROOT_URL)
+    points the client at another host, e.g. a stand-in server.
+    """
+    root_url = root_url or os.environ.get('GOOGLE_FIT_ROOT_URL')
+    key = (credentials_key(credentials), root_url)
+    client = _clients.get(key)
+    metrics.increment(metrics.CACHE_LOOKUPS, cache='fitness_client',
+                      result='misses' if client is None else 'hits')
+
+    if client is None:
+        from googleapiclient.discovery import build_from_document
+        discovery = load_fitness_discovery()
+        client_options = None
+        if root_url:
+            client_options = {'api_endpoint': root_url.rstrip('/') + '/' + discovery['servicePath']}
+        service = build_from_document(
+            discovery, credentials=credentials, client_options=client_options
+        )
+        client = (credentials, service)
+        _clients.put(key, client)
+
+    cached_credentials, service = client
+    refresh_if_needed(cached_credentials)
+    return cached_credentials, service
+
+
+def get_thread_http(credentials):
+    """Authorized httplib2 client for the calling thread
+
+    The cached service is shared across threads but httplib2.Http isn't
+    thread-safe, so every request.execute() passes one of these instead of
+    using the service's own. Each thread keeps the client for the last
+    credentials it used, so its keep-alive connection is reused.
+    """
+    key = credentials_key(credentials)
+    if getattr(_thread_http, 'key', None) != key:
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+        _thread_http.http = AuthorizedHttp(credentials, http=httplib2.Http())
+        _thread_http.key = key
+    return _thread_http.http
+
+
+def clear_fitness_clients():
+    _clients.clear()
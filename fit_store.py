@@ -0,0 +1,125 @@
+import os
+import sqlite3
+import threading
+import time
+
+from paths import DEFAULT_CACHE_DIR
+
+DEFAULT_DB_PATH = os.path.join(DEFAULT_CACHE_DIR, 'fit_store.sqlite3')
+
+METRIC_COLUMNS = ['steps', 'calories', 'active_minutes', 'heart_rate_avg', 'sleep_hours']
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+class FitStore:
+    """Local store of daily Google Fit buckets per user
+
+    Tracks, per user, the first synced day and the last *complete* day
+    (the high-water mark). Days after the high-water mark - at most
+    today's partial bucket - are the only ones a sync has to re-fetch.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = self.connect()
+
+    def connect(self):
+        if self.db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+
+        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS daily_buckets (
+                user_id TEXT NOT NULL,
+                day TEXT NOT NULL,
+                steps INTEGER NOT NULL,
+                calories REAL NOT NULL,
+                active_minutes INTEGER NOT NULL,
+                heart_rate_avg REAL NOT NULL,
+                sleep_hours REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (user_id, day)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS sync_state (
+                user_id TEXT PRIMARY KEY,
+                first_day TEXT NOT NULL,
+                last_complete_day TEXT NOT NULL,
+                synced_at REAL NOT NULL
+            )
+        ''')
+        conn.commit()
+        return conn
+
+    def get_sync_state(self, user_id):
+        """Return (first_day, last_complete_day) as ISO dates, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT first_day, last_complete_day FROM sync_state WHERE user_id = ?',
+                (user_id,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def merge_days(self, user_id, daily_rows, synced_range=None):
+        """Upsert daily rows in place, optionally recording the synced range
+
+        synced_range is (first_day, last_complete_day) as ISO dates; leave it
+        None when part of the fetch failed so the next sync retries the gap.
+        """
+        now = time.time()
+        rows = [
+            (user_id, day['date'], *(day[column] for column in METRIC_COLUMNS), now)
+            for day in daily_rows
+        ]
+
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO daily_buckets '
+                '(user_id, day, steps, calories, active_minutes, heart_rate_avg, '
+                'sleep_hours, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                rows
+            )
+            if synced_range is not None:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO sync_state '
+                    '(user_id, first_day, last_complete_day, synced_at) VALUES (?, ?, ?, ?)',
+                    (user_id, synced_range[0], synced_range[1], now)
+                )
+            self._conn.commit()
+
+    def load_days(self, user_id, start_day, end_day):
+        """Daily rows for start_day..end_day (ISO dates, inclusive), oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT day, steps, calories, active_minutes, heart_rate_avg, sleep_hours '
+                'FROM daily_buckets WHERE user_id = ? AND day BETWEEN ? AND ? ORDER BY day',
+                (user_id, start_day, end_day)
+            ).fetchall()
+
+        return [
+            dict(zip(['date'] + METRIC_COLUMNS, row))
+            for row in rows
+        ]
+
+    def clear_user(self, user_id):
+        with self._lock:
+            self._conn.execute('DELETE FROM daily_buckets WHERE user_id = ?', (user_id,))
+            self._conn.execute('DELETE FROM sync_state WHERE user_id = ?', (user_id,))
+            self._conn.commit()
+
+
+def get_fit_store():
+    """Return the process-wide fit store, creating it on first use"""
+    global _shared_store
+
+    if _shared_store is None:
+        with _shared_store_lock:
+            if _shared_store is None:
+                _shared_store = FitStore()
+    return _shared_store
@@ -1,20 +1,32 @@
-import requests
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
 import streamlit as st
 from datetime import datetime, timedelta
 
+from fit_aggregate import fetch_aggregate_chunked
+from fit_service import get_fitness_client
+import metrics
+
 class FitnessDataManager:
-    def __init__(self):
+    def __init__(self, chunk_days=30, max_workers=4, fit_root_url=None):
         self.google_fit_scopes = [
             'https://www.googleapis.com/auth/fitness.activity.read',
             'https://www.googleapis.com/auth/fitness.body.read',
             'https://www.googleapis.com/auth/fitness.sleep.read'
         ]
         self.service = None
+        self.credentials = None
+        
+        # Long histories are fetched as concurrent chunks of chunk_days
+        self.chunk_days = chunk_days
+        self.max_workers = max_workers
+        self.failed_chunks = []
+        
+        # Alternate Fitness API host (e.g. a stand-in server); None = Google
+        self.fit_root_url = fit_root_url
     
     def authenticate_google_fit(self):
         """Authenticate with Google Fit API"""
+        from google.oauth2.credentials import Credentials
+        
         try:
             if 'google_fit_token' in st.session_state:
                 credentials = Credentials.from_authorized_user_info(
@@ -35,7 +47,8 @@ class FitnessDataManager:
                 else:
                     return False
             
-            self.service = build('fitness', 'v1', credentials=credentials)
+            # Cached per credential; built from the pre-parsed discovery doc
+            self.credentials, self.service = get_fitness_client(credentials, root_url=self.fit_root_url)
             return True
             
         except Exception as e:
@@ -65,10 +78,7 @@ class FitnessDataManager:
                 "endTimeMillis": end_time_ns // 1000000
             }
             
-            response = self.service.users().dataset().aggregate(
-                userId='me', 
-                body=request_body
-            ).execute()
+            response = self.fetch_aggregate(request_body)
             
             sleep_data = []
             for bucket in response.get('bucket', []):
@@ -88,6 +98,7 @@ class FitnessDataManager:
             return sleep_data
             
         except Exception as e:
+            metrics.increment(metrics.FALLBACKS, source='fitness_integration')
             st.error(f"Error fetching sleep data: {str(e)}")
             return self.get_fallback_sleep_data()
     
@@ -115,10 +126,7 @@ class FitnessDataManager:
                 "endTimeMillis": end_time_ns // 1000000
             }
             
-            response = self.service.users().dataset().aggregate(
-                userId='me',
-                body=request_body
-            ).execute()
+            response = self.fetch_aggregate(request_body)
             
             activity_data = []
             for bucket in response.get('bucket', []):
@@ -147,9 +155,25 @@ class FitnessDataManager:
             return activity_data
             
         except Exception as e:
+            metrics.increment(metrics.FALLBACKS, source='fitness_integration')
             st.error(f"Error fetching activity data: {str(e)}")
             return self.get_fallback_activity_data()
     
+    def fetch_aggregate(self, request_body):
+        """Run an aggregate request as concurrent chunks, noting failed ranges"""
+        with metrics.timer(metrics.FIT_SECONDS, client='fitness_integration',
+                           operation='fetch_aggregate'):
+            response, self.failed_chunks = fetch_aggregate_chunked(
+                self.service, self.credentials, request_body,
+                chunk_days=self.chunk_days, max_workers=self.max_workers
+            )
+        
+        if self.failed_chunks:
+            st.warning(f"Some Google Fit data could not be loaded "
+                       f"({len(self.failed_chunks)} date ranges failed)")
+        
+        return response
+    
     def get_fallback_sleep_data(self):
         """Fallback sleep data if API fails"""
         return [
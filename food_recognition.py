@@ -1,71 +1,80 @@
-import requests
-import cv2
-import numpy as np
-from PIL import Image
 import streamlit as st
 
+from logmeal_api import LogMealAPI
+import metrics
+from parallel import imap_bounded
+from rate_limit import RateLimitExceeded
+
 class FoodRecognizer:
-    def __init__(self):
-        self.logmeal_api_key = st.secrets["LOGMEAL_API_KEY"]
-        self.logmeal_url = "https://api.logmeal.com/v2"
+    def __init__(self, food_api=None, **options):
+        # Recognition, nutrition lookups, caching, rate limiting and circuit
+        # breaking all run in LogMealAPI; options are its constructor
+        # arguments. This class reshapes the result and weights by portion.
+        self.food_api = food_api or LogMealAPI(client_name='food_recognition', **options)
     
     def analyze_food_image(self, image_file):
         """Analyze food image and return nutrition data"""
         try:
-            # Convert Streamlit uploaded file to format needed for API
-            image_bytes = image_file.getvalue()
-            
-            # Call LogMeal API for food recognition
-            food_detection = self.detect_foods_logmeal(image_bytes)
+            return self.run_food_analysis(image_file)
             
-            # Get nutrition information
-            nutrition_data = self.get_nutrition_info(food_detection)
-            
-            return {
-                'detected_foods': food_detection,
-                'nutrition': nutrition_data,
-                'confidence': self.calculate_overall_confidence(food_detection)
-            }
+        except RateLimitExceeded:
+            raise  # Backpressure for the caller to show - not fallback data
             
         except Exception as e:
+            metrics.increment(metrics.FALLBACKS, source='food_recognition')
             st.error(f"Food recognition error: {str(e)}")
             return self.get_fallback_analysis()
     
-    def detect_foods_logmeal(self, image_bytes):
-        """Use LogMeal API for food detection"""
-        headers = {
-            'Authorization': f'Bearer {self.logmeal_api_key}',
-            'Content-Type': 'application/json'
-        }
+    def run_food_analysis(self, image_file):
+        """Detect foods and total their nutrition, raising on API failure"""
+        # Convert Streamlit uploaded file to format needed for API
+        if isinstance(image_file, (bytes, bytearray)):
+            image_bytes = bytes(image_file)
+        else:
+            image_bytes = image_file.getvalue()
+        
+        analysis = self.food_api.run_food_analysis(image_bytes)
+        food_detection = self.detect_foods(analysis['foods'])
         
-        files = {
-            'image': ('meal.jpg', image_bytes, 'image/jpeg')
+        return {
+            'detected_foods': food_detection,
+            'nutrition': self.get_nutrition_info(food_detection, analysis['food_nutrition']),
+            'confidence': self.calculate_overall_confidence(food_detection)
         }
+    
+    def analyze_food_images(self, image_files, max_workers=4, ordered=True):
+        """Analyze many meal images, streaming results as they complete
         
-        response = requests.post(
-            f"{self.logmeal_url}/recognition/complete",
-            headers=headers,
-            files=files
-        )
+        Accepts uploaded files or raw bytes. Yields one dict per image with
+        its index, success flag, the analysis result, the error message on
+        failure and elapsed_ms - failures are not replaced by fallback data.
+        """
+        for index, _, result, error, elapsed_ms in imap_bounded(
+            self.run_food_analysis, image_files, max_workers=max_workers, ordered=ordered
+        ):
+            yield {
+                'index': index,
+                'success': error is None,
+                'result': result,
+                'error': str(error) if error is not None else None,
+                'elapsed_ms': elapsed_ms
+            }
+    
+    def detect_foods(self, recognition_results):
+        """LogMeal recognition results as detected-food dicts"""
+        detected_foods = []
+        for food in recognition_results:
+            detected_foods.append({
+                'name': food['name'],
+                'confidence': food['prob'],
+                'food_id': food['food_id'],
+                'portion_size': food.get('portion_size', 'medium')
+            })
         
-        if response.status_code == 200:
-            result = response.json()
-            
-            detected_foods = []
-            for food in result.get('recognition_results', []):
-                detected_foods.append({
-                    'name': food['name'],
-                    'confidence': food['prob'],
-                    'food_id': food['food_id'],
-                    'portion_size': food.get('portion_size', 'medium')
-                })
-            
-            return detected_foods
-        else:
-            raise Exception(f"LogMeal API error: {response.status_code}")
+        return detected_foods
     
-    def get_nutrition_info(self, detected_foods):
-        """Get nutrition information for detected foods"""
+    def get_nutrition_info(self, detected_foods, food_nutrition):
+        """Total the per-food nutrition facts for detected foods"""
         total_nutrition = {
             'calories': 0,
             'protein': 0,
@@ -75,26 +84,19 @@ class FoodRecognizer:
             'sugar': 0
         }
         
-        for food in detected_foods:
-            # Get nutrition data for each food
-            nutrition_response = requests.get(
-                f"{self.logmeal_url}/nutrition/recipe/nutritionalInfo",
-                headers={'Authorization': f'Bearer {self.logmeal_api_key}'},
-                params={'food_id': food['food_id']}
-            )
+        for food, nutrition in zip(detected_foods, food_nutrition):
+            if nutrition is None:
+                continue
             
-            if nutrition_response.status_code == 200:
-                nutrition = nutrition_response.json()
-                
-                # Weight by confidence and portion size
-                weight_factor = food['confidence'] * self.get_portion_multiplier(food['portion_size'])
-                
-                total_nutrition['calories'] += nutrition.get('calories', 0) * weight_factor
-                total_nutrition['protein'] += nutrition.get('protein', 0) * weight_factor
-                total_nutrition['carbs'] += nutrition.get('carbs', 0) * weight_factor
-                total_nutrition['fat'] += nutrition.get('fat', 0) * weight_factor
-                total_nutrition['fiber'] += nutrition.get('fiber', 0) * weight_factor
-                total_nutrition['sugar'] += nutrition.get('sugar', 0) * weight_factor
+            # Weight by confidence and portion size
+            weight_factor = food['confidence'] * self.get_portion_multiplier(food['portion_size'])
+            
+            total_nutrition['calories'] += nutrition.get('calories', 0) * weight_factor
+            total_nutrition['protein'] += nutrition.get('protein', 0) * weight_factor
+            total_nutrition['carbs'] += nutrition.get('carbs', 0) * weight_factor
+            total_nutrition['fat'] += nutrition.get('fat', 0) * weight_factor
+            total_nutrition['fiber'] += nutrition.get('fiber', 0) * weight_factor
+            total_nutrition['sugar'] += nutrition.get('sugar', 0) * weight_factor
         
         return total_nutrition
     
@@ -108,6 +110,12 @@ class FoodRecognizer:
         }
         return multipliers.get(portion_size, 1.0)
     
+    def calculate_overall_confidence(self, detected_foods):
+        """Average detection confidence across foods"""
+        if not detected_foods:
+            return 0
+        return sum(food['confidence'] for food in detected_foods) / len(detected_foods)
+    
     def get_fallback_analysis(self):
         """Fallback analysis if API fails"""
         return {
@@ -1,14 +1,40 @@
 import streamlit as st
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
 import json
-from datetime import datetime, timedelta
+import os
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from app_cache import invalidate
+from fit_aggregate import stream_aggregate_chunked
+from fit_service import get_fitness_client
+from fit_store import get_fit_store
+import metrics
+from user_identity import resolve_user_id
+
+# Recent days are re-fetched on every sync: phones upload steps and sleep
+# hours late, after the day was first stored
+LATE_SYNC_DAYS = 3
+
+
+def local_time_zone():
+    """IANA name of this machine's time zone ('UTC' if it can't be told)"""
+    name = os.environ.get('TZ', '').lstrip(':')
+    if not name:
+        target = os.path.realpath('/etc/localtime')
+        if 'zoneinfo/' in target:
+            name = target.split('zoneinfo/', 1)[1]
+    try:
+        ZoneInfo(name)
+    except (ValueError, ZoneInfoNotFoundError):
+        return 'UTC'
+    return name
+
 
 class GoogleFitIntegration:
-    def __init__(self):
+    def __init__(self, chunk_days=30, max_workers=4, store=None, fit_root_url=None,
+                 time_zone=None):
         self.SCOPES = [
+            'openid',  # Account id, so stored data follows the user across sessions
             'https://www.googleapis.com/auth/fitness.activity.read',
             'https://www.googleapis.com/auth/fitness.body.read', 
             'https://www.googleapis.com/auth/fitness.sleep.read',
@@ -18,8 +44,25 @@ class GoogleFitIntegration:
         self.CLIENT_SECRET = st.secrets["GOOGLE_CLIENT_SECRET"]
         self.REDIRECT_URI = "http://localhost:8501/oauth2callback"
         
+        # Long histories are fetched as concurrent chunks of chunk_days
+        self.chunk_days = chunk_days
+        self.max_workers = max_workers
+        self.credentials = None
+        
+        # Daily buckets already synced are served from the local store
+        self.store = store or get_fit_store()
+        
+        # Alternate Fitness API host (e.g. a stand-in server); None = Google
+        self.fit_root_url = fit_root_url
+        
+        # Days are bucketed on calendar days in this IANA zone
+        self.time_zone = time_zone or local_time_zone()
+        self.zone = ZoneInfo(self.time_zone)
+        
     def get_authorization_url(self):
         """Generate Google OAuth authorization URL"""
+        from google_auth_oauthlib.flow import Flow
+        
         flow = Flow.from_client_config(
             {
                 "web": {
@@ -39,6 +82,8 @@ class GoogleFitIntegration:
     
     def exchange_code_for_token(self, authorization_code):
         """Exchange authorization code for access token"""
+        from google_auth_oauthlib.flow import Flow
+        
         try:
             flow = Flow.from_client_config(
                 {
@@ -54,17 +99,21 @@ class GoogleFitIntegration:
             )
             flow.redirect_uri = self.REDIRECT_URI
             
-            flow.fetch_token(code=authorization_code)
+            with metrics.timer(metrics.OUTBOUND_SECONDS, service='google_oauth',
+                               endpoint='token_exchange'):
+                flow.fetch_token(code=authorization_code)
             credentials = flow.credentials
             
             # Store credentials in session state
             st.session_state.google_fit_credentials = {
+                'account_id': self.account_id(credentials),
                 'token': credentials.token,
                 'refresh_token': credentials.refresh_token,
                 'token_uri': credentials.token_uri,
                 'client_id': credentials.client_id,
                 'client_secret': credentials.client_secret,
-                'scopes': credentials.scopes
+                'scopes': credentials.scopes,
+                'expiry': credentials.expiry.isoformat() if credentials.expiry else None
             }
             
             return True
@@ -72,103 +121,208 @@ class GoogleFitIntegration:
             st.error(f"OAuth Error: {str(e)}")
             return False
     
-    def get_fitness_service(self):
-        """Build Google Fit API service"""
+    @staticmethod
+    def account_id(credentials):
+        """Google account id (OpenID subject) from the token exchange, or None"""
+        from google.auth import jwt
+        
+        if not getattr(credentials, 'id_token', None):
+            return None
+        try:
+            # Came straight from Google's token endpoint over TLS
+            return jwt.decode(credentials.id_token, verify=False).get('sub')
+        except ValueError:
+            return None
+    
+    def get_credentials(self):
+        """Load stored OAuth credentials"""
         if 'google_fit_credentials' not in st.session_state:
             return None
-            
+        
+        from google.oauth2.credentials import Credentials
+        
+        creds_data = st.session_state.google_fit_credentials
+        return Credentials.from_authorized_user_info(creds_data)
+    
+    def get_fitness_service(self):
+        """Build Google Fit API service"""
         try:
+            credentials = self.get_credentials()
+            if credentials is None:
+                return None
+            
+            # Reuses the service built for these credentials; only refreshes
+            # the token when it is close to expiry
+            self.credentials, service = get_fitness_client(credentials, root_url=self.fit_root_url)
+            
             creds_data = st.session_state.google_fit_credentials
-            credentials = Credentials.from_authorized_user_info(creds_data)
+            if self.credentials.token != creds_data.get('token'):
+                creds_data['token'] = self.credentials.token
+                creds_data['expiry'] = self.credentials.expiry.isoformat() if self.credentials.expiry else None
             
-            if credentials.expired and credentials.refresh_token:
-                credentials.refresh(Request())
-                
-            service = build('fitness', 'v1', credentials=credentials)
             return service
         except Exception as e:
+            metrics.increment(metrics.FALLBACKS, source='google_fit_api')
             st.error(f"Service Error: {str(e)}")
             return None
     
-    def get_recent_health_data(self, days_back=7):
-        """Get comprehensive health data from Google Fit"""
+    def get_recent_health_data(self, user_id=None, days_back=7):
+        """Get comprehensive health data from Google Fit
+        
+        user_id keys the local store and defaults to the visitor's stable id
+        (user_identity.resolve_user_id) - never a per-session one, or each
+        new session would lose the high-water mark and fetch every day again.
+        """
+        # Bring the local store up to date, then read the window from it
+        try:
+            failed_chunks = self.sync_recent_days(user_id, days_back)
+        except Exception as e:
+            metrics.increment(metrics.FALLBACKS, source='google_fit_api')
+            st.warning(f"Using demo data: {str(e)}")
+            return self.get_demo_health_data()
+        
+        health_data = self.load_recent_health_data(user_id, days_back)
+        health_data['failed_chunks'] = failed_chunks
+        return health_data
+    
+    def recent_window(self, days_back):
+        """(first day, today) of the last days_back local days"""
+        today = datetime.now(self.zone).date()
+        return today - timedelta(days=days_back - 1), today
+    
+    def sync_recent_days(self, user_id=None, days_back=7):
+        """Sync the last days_back days into the local store
+        
+        Returns the chunks that failed to download; raises when Google Fit
+        can't be reached at all. user_id as for get_recent_health_data.
+        """
         service = self.get_fitness_service()
         if not service:
-            return self.get_demo_health_data()
+            raise ConnectionError("Google Fit is not connected")
         
-        try:
-            end_time = datetime.now()
-            start_time = end_time - timedelta(days=days_back)
+        window_start, today = self.recent_window(days_back)
+        failed_chunks = self.sync_health_data(service, user_id or resolve_user_id(), window_start, today)
+        
+        if failed_chunks:
+            st.warning(f"Some Google Fit data could not be loaded "
+                       f"({len(failed_chunks)} date ranges failed)")
+        return failed_chunks
+    
+    def load_recent_health_data(self, user_id=None, days_back=7):
+        """Health data for the last days_back days from the local store only"""
+        window_start, today = self.recent_window(days_back)
+        return self.build_health_data(self.store.load_days(
+            user_id or resolve_user_id(), window_start.isoformat(), today.isoformat()
+        ))
+    
+    def sync_health_data(self, service, user_id, window_start, today):
+        """Fetch only the days the store doesn't hold as complete and merge them
+        
+        The last LATE_SYNC_DAYS complete days are fetched again each time,
+        so data uploaded after a day was stored still reaches it. Returns
+        the list of chunks that failed to download, and bumps the user's
+        'fit' data version so cached reads of the store are recomputed.
+        """
+        from fit_parse import DailyAccumulator  # NumPy loads on first sync
+        
+        state = self.store.get_sync_state(user_id)
+        
+        if state is None or window_start > date.fromisoformat(state[1]) + timedelta(days=1):
+            # Nothing contiguous stored yet - fetch the whole window
+            first_day = window_start
+            fetch_ranges = [(window_start, today)]
+        else:
+            first_day, last_complete_day = (date.fromisoformat(day) for day in state)
+            fetch_ranges = []
             
-            # Convert to nanoseconds (Google Fit format)
-            start_time_ns = int(start_time.timestamp() * 1_000_000_000)
-            end_time_ns = int(end_time.timestamp() * 1_000_000_000)
+            # Days after the high-water mark, including today's partial
+            # bucket, plus the recent days late uploads may still change
+            refetch_from = max(
+                first_day,
+                min(last_complete_day + timedelta(days=1), today - timedelta(days=LATE_SYNC_DAYS))
+            )
             
-            # Aggregate request for multiple data types
-            request_body = {
-                "aggregateBy": [
-                    {"dataTypeName": "com.google.step_count.delta"},
-                    {"dataTypeName": "com.google.calories.expended"},
-                    {"dataTypeName": "com.google.active_minutes"},
-                    {"dataTypeName": "com.google.heart_rate.bpm"},
-                    {"dataTypeName": "com.google.sleep.segment"}
-                ],
-                "bucketByTime": {"durationMillis": 86400000},  # Daily buckets
-                "startTimeMillis": start_time_ns // 1_000_000,
-                "endTimeMillis": end_time_ns // 1_000_000
-            }
+            # Backfill days older than anything stored
+            if window_start < first_day:
+                fetch_ranges.append((window_start, first_day - timedelta(days=1)))
+                first_day = window_start
             
-            response = service.users().dataset().aggregate(
-                userId='me', 
-                body=request_body
-            ).execute()
+            fetch_ranges.append((refetch_from, today))
+        
+        daily_rows = []
+        failed_chunks = []
+        for range_start, range_end in fetch_ranges:
+            if range_start > range_end:
+                continue
             
-            return self.process_google_fit_response(response)
+            request_body = self.build_aggregate_request(range_start, range_end)
+            accumulator = DailyAccumulator(
+                request_body['startTimeMillis'], request_body['endTimeMillis'], self.zone
+            )
             
-        except Exception as e:
-            st.warning(f"Using demo data: {str(e)}")
-            return self.get_demo_health_data()
+            # Split long windows into chunks fetched in parallel, each parsed
+            # straight into the per-day accumulator as it arrives
+            with metrics.timer(metrics.FIT_SECONDS, client='google_fit_api', operation='fetch_range'):
+                failed = stream_aggregate_chunked(
+                    service, self.credentials, request_body, accumulator,
+                    chunk_days=self.chunk_days, max_workers=self.max_workers
+                )
+            daily_rows.extend(accumulator.to_rows())
+            failed_chunks.extend(failed)
+        
+        # Only advance the high-water mark when every chunk came back
+        yesterday = today - timedelta(days=1)
+        synced_range = None if failed_chunks else (first_day.isoformat(), yesterday.isoformat())
+        with metrics.timer(metrics.FIT_SECONDS, client='google_fit_api', operation='store_merge'):
+            self.store.merge_days(user_id, daily_rows, synced_range)
+        invalidate(user_id, 'fit')
+        
+        return failed_chunks
+    
+    def build_aggregate_request(self, start_day, end_day):
+        """Aggregate request body for whole local days start_day..end_day
+        
+        Buckets are calendar days in time_zone rather than fixed 24h spans,
+        so DST days come back as one 23- or 25-hour bucket.
+        """
+        start_time = datetime.combine(start_day, time.min, tzinfo=self.zone)
+        end_time = min(
+            datetime.now(self.zone),
+            datetime.combine(end_day + timedelta(days=1), time.min, tzinfo=self.zone)
+        )
+        
+        return {
+            "aggregateBy": [
+                {"dataTypeName": "com.google.step_count.delta"},
+                {"dataTypeName": "com.google.calories.expended"},
+                {"dataTypeName": "com.google.active_minutes"},
+                {"dataTypeName": "com.google.heart_rate.bpm"},
+                {"dataTypeName": "com.google.sleep.segment"}
+            ],
+            "bucketByTime": {"period": {"type": "day", "value": 1, "timeZoneId": self.time_zone}},
+            "startTimeMillis": int(start_time.timestamp() * 1000),
+            "endTimeMillis": int(end_time.timestamp() * 1000)
+        }
     
     def process_google_fit_response(self, response):
         """Process Google Fit API response into usable format"""
+        return self.build_health_data(self.parse_daily_buckets(response))
+    
+    def parse_daily_buckets(self, response):
+        """Turn aggregate response buckets into one dict per day"""
+        from fit_parse import parse_aggregate_response
+        
+        return parse_aggregate_response(response)
+    
+    def build_health_data(self, daily_rows):
+        """Assemble fitness and sleep lists from per-day rows"""
         health_data = {
             'sleep_data': [],
             'fitness_data': [],
             'last_updated': datetime.now().isoformat()
         }
         
-        for bucket in response.get('bucket', []):
-            date = datetime.fromtimestamp(
-                int(bucket['startTimeMillis']) / 1000
-            ).date()
-            
-            daily_data = {
-                'date': date.isoformat(),
-                'steps': 0,
-                'calories': 0,
-                'active_minutes': 0,
-                'heart_rate_avg': 70,
-                'sleep_hours': 7.5
-            }
-            
-            for dataset in bucket.get('dataset', []):
-                data_type = dataset.get('dataSourceId', '')
-                
-                for point in dataset.get('point', []):
-                    if 'step_count' in data_type:
-                        daily_data['steps'] += point['value'][0].get('intVal', 0)
-                    elif 'calories' in data_type:
-                        daily_data['calories'] += point['value'][0].get('fpVal', 0)
-                    elif 'active_minutes' in data_type:
-                        daily_data['active_minutes'] += point['value'][0].get('intVal', 0)
-                    elif 'heart_rate' in data_type:
-                        daily_data['heart_rate_avg'] = point['value'][0].get('fpVal', 70)
-                    elif 'sleep' in data_type:
-                        sleep_duration = (
-                            int(point['endTimeNanos']) - int(point['startTimeNanos'])
-                        ) / (1_000_000_000 * 3600)  # Convert to hours
-                        daily_data['sleep_hours'] = sleep_duration
-            
+        for daily_data in daily_rows:
             health_data['fitness_data'].append(daily_data)
             health_data['sleep_data'].append({
                 'date': daily_data['date'],
@@ -1,94 +1,299 @@
-class HealthAnalyzer {
-  constructor() {
-    this.healthWeights = {
-      sleep: 0.35,
-      nutrition: 0.35,
-      fitness: 0.30
-    };
-  }
-
-  async generateRecommendations() {
-    // Demo recommendations for hackathon
-    return [
-      {
-        id: '1',
-        title: 'Increase Daily Steps',
-        category: 'Fitness',
-        priority: 'high',
-        description: "You're averaging 7,500 steps daily. Increase to 10,000 for optimal health.",
-        actions: [
-          'Take a 10-minute walk after each meal',
-          'Use stairs instead of elevators',
-          'Park further from destinations',
-        ],
-        confidence: 85,
-      },
-      {
-        id: '2',
-        title: 'Optimize Sleep Schedule',
-        category: 'Sleep',
-        priority: 'medium',
-        description: 'Your sleep duration varies significantly. Consistency improves quality.',
-        actions: [
-          'Set a fixed bedtime and wake time',
-          'Avoid screens 1 hour before bed',
-          'Keep bedroom temperature at 65-68°F',
-        ],
-        confidence: 78,
-      },
-      {
-        id: '3',
-        title: 'Increase Protein Intake',
-        category: 'Nutrition',
-        priority: 'medium',
-        description: 'Your meals average 18% protein. Aim for 22-25% for better satiety.',
-        actions: [
-          'Include protein in every meal',
-          'Add nuts or Greek yogurt as snacks',
-          'Consider protein-rich breakfast options',
-        ],
-        confidence: 72,
-      },
-    ];
-  }
-
-  async generateInsights() {
-    return [
-      {
-        id: '1',
-        title: '🛌 Sleep Pattern Analysis',
-        message: 'Your sleep duration has improved by 15 minutes over the past week. Keep up the consistent bedtime routine!',
-        dataSource: 'Sleep tracking data from connected apps',
-        type: 'positive',
-      },
-      {
-        id: '2',
-        title: '🏃 Activity Trend',
-        message: "You're most active on weekdays between 6-8 PM. Consider maintaining this energy on weekends.",
-        dataSource: 'Daily step count and activity patterns',
-        type: 'neutral',
-      },
-      {
-        id: '3',
-        title: '🍎 Nutrition Balance',
-        message: 'Your logged meals show good fiber intake but could benefit from more lean protein sources.',
-        dataSource: 'Food recognition and nutrition analysis',
-        type: 'improvement',
-      },
-    ];
-  }
-
-  calculateHealthScore(healthData) {
-    const stepsScore = Math.min(100, (healthData.steps / 10000) * 100);
-    const sleepScore = Math.max(0, 100 - Math.abs(healthData.sleep - 8) * 12.5);
-    const activeScore = Math.min(100, (healthData.activeMinutes / 60) * 100);
-    
-    return Math.round(
-      stepsScore * this.healthWeights.fitness +
-      sleepScore * this.healthWeights.sleep +
-      activeScore * this.healthWeights.fitness
-    );
-  }
+import numpy as np
+
+# Same component weights as the mobile HealthAnalyzer service
+HEALTH_WEIGHTS = {
+    'sleep': 0.35,
+    'nutrition': 0.35,
+    'fitness': 0.30
 }
 
-export default HealthAnalyzer;
+FITNESS_FIELDS = ['steps', 'active_minutes', 'calories']
+SLEEP_FIELDS = ['duration_hours', 'quality_estimate']
+NUTRITION_FIELDS = ['calories', 'protein', 'carbs', 'fat', 'fiber', 'sugar']
+
+# One entry per recommendation flag column returned by score_batch
+RECOMMENDATIONS = [
+    {
+        'title': 'Increase Daily Steps',
+        'category': 'Fitness',
+        'priority': 'high',
+        'description': 'Your average is well below 10,000 steps a day. Small walks add up quickly.',
+        'actions': [
+            'Take a 10-minute walk after each meal',
+            'Use stairs instead of elevators',
+            'Park further from destinations'
+        ]
+    },
+    {
+        'title': 'Add More Active Minutes',
+        'category': 'Fitness',
+        'priority': 'medium',
+        'description': 'You are getting less than an hour of activity a day.',
+        'actions': [
+            'Schedule a 30-minute workout on most days',
+            'Try brisk walking or cycling for short trips',
+            'Stand up and move for 5 minutes every hour'
+        ]
+    },
+    {
+        'title': 'Optimize Sleep Schedule',
+        'category': 'Sleep',
+        'priority': 'high',
+        'description': 'Your sleep duration is outside the healthy 7-9 hour range.',
+        'actions': [
+            'Set a fixed bedtime and wake time',
+            'Avoid screens 1 hour before bed',
+            'Keep bedroom temperature at 65-68°F'
+        ]
+    },
+    {
+        'title': 'Improve Sleep Quality',
+        'category': 'Sleep',
+        'priority': 'medium',
+        'description': 'Your sleep quality estimates are below average.',
+        'actions': [
+            'Limit caffeine after 2 PM',
+            'Keep your bedroom dark and quiet',
+            'Wind down with a consistent pre-sleep routine'
+        ]
+    },
+    {
+        'title': 'Increase Protein Intake',
+        'category': 'Nutrition',
+        'priority': 'medium',
+        'description': 'Less than 20% of your calories come from protein. Aim for 22-25%.',
+        'actions': [
+            'Include protein in every meal',
+            'Add nuts or Greek yogurt as snacks',
+            'Consider protein-rich breakfast options'
+        ]
+    },
+    {
+        'title': 'Eat More Fiber',
+        'category': 'Nutrition',
+        'priority': 'low',
+        'description': 'Your meals average under 6g of fiber.',
+        'actions': [
+            'Add vegetables or legumes to each meal',
+            'Choose whole grains over refined ones',
+            'Snack on fruit instead of processed snacks'
+        ]
+    },
+    {
+        'title': 'Cut Back on Sugar',
+        'category': 'Nutrition',
+        'priority': 'medium',
+        'description': 'Your meals average more than 20g of sugar.',
+        'actions': [
+            'Swap sugary drinks for water or tea',
+            'Choose whole fruits over juices and desserts',
+            'Check labels for added sugar'
+        ]
+    }
+]
+
+
+def group_mean(user_index, values, n_users):
+    """Per-user mean of values, ignoring NaN; NaN for users with no data"""
+    valid = ~np.isnan(values)
+    sums = np.bincount(user_index[valid], weights=values[valid], minlength=n_users)
+    counts = np.bincount(user_index[valid], minlength=n_users)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums / counts
+
+
+def group_sum(user_index, values, n_users):
+    """Per-user sum of values, ignoring NaN; NaN for users with no data"""
+    valid = ~np.isnan(values)
+    sums = np.bincount(user_index[valid], weights=values[valid], minlength=n_users)
+    counts = np.bincount(user_index[valid], minlength=n_users)
+    return np.where(counts > 0, sums, np.nan)
+
+
+def records_to_columns(records, fields):
+    """Convert a list of record dicts into float64 columns (missing -> NaN)"""
+    return {
+        field: np.array([record.get(field, np.nan) for record in records], dtype=np.float64)
+        for field in fields
+    }
+
+
+def calculate_health_scores(steps, sleep_hours, active_minutes):
+    """Daily health scores (0-100 ints) for whole columns at once
+
+    Same formula and float64 operation order as the dashboard's scalar
+    score - 40% steps, 40% sleep vs 8h, 20% active minutes - and np.rint
+    rounds half to even like round(), so results are identical.
+    """
+    steps = np.asarray(steps, dtype=np.float64)
+    sleep_hours = np.asarray(sleep_hours, dtype=np.float64)
+    active_minutes = np.asarray(active_minutes, dtype=np.float64)
+
+    steps_score = np.minimum(100, (steps / 10000) * 100)
+    sleep_score = np.maximum(0, 100 - np.abs(sleep_hours - 8) * 12.5)
+    active_score = np.minimum(100, (active_minutes / 60) * 100)
+
+    return np.rint(steps_score * 0.4 + sleep_score * 0.4 + active_score * 0.2).astype(np.int64)
+
+
+def calculate_health_scores_frame(frame, steps='steps', sleep_hours='sleep_hours',
+                                  active_minutes='active_minutes'):
+    """calculate_health_scores over DataFrame columns"""
+    return calculate_health_scores(
+        frame[steps].to_numpy(), frame[sleep_hours].to_numpy(), frame[active_minutes].to_numpy()
+    )
+
+
+class HealthAnalyzer:
+    """Vectorized health scoring engine
+
+    score_batch takes columnar NumPy arrays for any number of users' daily
+    records and computes every score and recommendation flag in one pass;
+    analyze_complete_health_profile is the single-user dict interface.
+    """
+
+    def __init__(self, weights=None):
+        self.health_weights = dict(weights or HEALTH_WEIGHTS)
+
+    def analyze_complete_health_profile(self, nutrition_data, fitness_data, sleep_data):
+        """Analyze one user's meals, daily fitness and sleep records"""
+        nutrition = records_to_columns(nutrition_data, NUTRITION_FIELDS)
+        fitness = records_to_columns(fitness_data, FITNESS_FIELDS)
+        sleep = records_to_columns(sleep_data, SLEEP_FIELDS)
+
+        nutrition['user'] = np.zeros(len(nutrition_data), dtype=np.int64)
+        fitness['user'] = np.zeros(len(fitness_data), dtype=np.int64)
+        sleep['user'] = np.zeros(len(sleep_data), dtype=np.int64)
+
+        scores = self.score_batch(nutrition, fitness, sleep, n_users=1)
+
+        return {
+            'unified_health_score': int(scores['unified_health_score'][0]),
+            'individual_scores': {
+                component: self.to_score(scores[f'{component}_score'][0])
+                for component in ('sleep', 'nutrition', 'fitness')
+            },
+            'recommendations': [
+                dict(recommendation)
+                for recommendation, flagged in zip(RECOMMENDATIONS, scores['recommendation_flags'][0])
+                if flagged
+            ]
+        }
+
+    def score_batch(self, nutrition, fitness, sleep, n_users=None):
+        """Score many users at once from columnar arrays
+
+        Each argument is a dict of equal-length arrays with an integer 'user'
+        column (0..n_users-1) plus the NUTRITION_FIELDS, FITNESS_FIELDS or
+        SLEEP_FIELDS columns; missing values may be NaN. Returns per-user
+        arrays: sleep/nutrition/fitness scores (NaN when a user has no data
+        of that kind), unified_health_score (0-100 ints) and a boolean
+        recommendation_flags matrix aligned with RECOMMENDATIONS.
+        """
+        if n_users is None:
+            n_users = 1 + max(
+                int(np.max(table['user'], initial=-1)) for table in (nutrition, fitness, sleep)
+            )
+
+        fitness_score, fitness_means = self.score_fitness(fitness, n_users)
+        sleep_score, sleep_means = self.score_sleep(sleep, n_users)
+        nutrition_score, nutrition_means = self.score_nutrition(nutrition, n_users)
+
+        # Weighted mean over the components each user actually has data for
+        components = np.vstack([sleep_score, nutrition_score, fitness_score])
+        weights = np.array([
+            self.health_weights['sleep'],
+            self.health_weights['nutrition'],
+            self.health_weights['fitness']
+        ])[:, np.newaxis]
+        available = ~np.isnan(components)
+        weight_totals = np.sum(weights * available, axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            unified = np.sum(np.where(available, components * weights, 0), axis=0) / weight_totals
+        unified = np.rint(np.nan_to_num(unified, nan=0.0)).astype(np.int64)
+
+        flags = np.column_stack([
+            fitness_means['steps'] < 10000,
+            fitness_means['active_minutes'] < 60,
+            (sleep_means['duration_hours'] < 7) | (sleep_means['duration_hours'] > 9),
+            sleep_means['quality_estimate'] < 7,
+            nutrition_means['protein_ratio'] < 0.20,
+            nutrition_means['fiber'] < 6,
+            nutrition_means['sugar'] > 20
+        ])
+
+        return {
+            'sleep_score': sleep_score,
+            'nutrition_score': nutrition_score,
+            'fitness_score': fitness_score,
+            'unified_health_score': unified,
+            'recommendation_flags': flags
+        }
+
+    def score_fitness(self, fitness, n_users):
+        """Steps and active-minute scores, averaged per user"""
+        user = np.asarray(fitness['user'], dtype=np.int64)
+        steps = group_mean(user, np.asarray(fitness['steps'], dtype=np.float64), n_users)
+        active = group_mean(user, np.asarray(fitness['active_minutes'], dtype=np.float64), n_users)
+
+        steps_score = np.minimum(100, steps / 10000 * 100)
+        active_score = np.minimum(100, active / 60 * 100)
+
+        score = np.where(
+            np.isnan(active_score), steps_score,
+            np.where(np.isnan(steps_score), active_score, steps_score * 0.6 + active_score * 0.4)
+        )
+        return score, {'steps': steps, 'active_minutes': active}
+
+    def score_sleep(self, sleep, n_users):
+        """Duration-vs-8h and quality scores, averaged per user"""
+        user = np.asarray(sleep['user'], dtype=np.int64)
+        duration = group_mean(user, np.asarray(sleep['duration_hours'], dtype=np.float64), n_users)
+        quality = group_mean(user, np.asarray(sleep['quality_estimate'], dtype=np.float64), n_users)
+
+        duration_score = np.maximum(0, 100 - np.abs(duration - 8) * 12.5)
+        quality_score = np.clip(quality * 10, 0, 100)
+
+        score = np.where(
+            np.isnan(quality_score), duration_score, duration_score * 0.7 + quality_score * 0.3
+        )
+        return score, {'duration_hours': duration, 'quality_estimate': quality}
+
+    def score_nutrition(self, nutrition, n_users):
+        """Macro balance, fiber and sugar scores over each user's meals"""
+        user = np.asarray(nutrition['user'], dtype=np.int64)
+        columns = {
+            field: np.asarray(nutrition[field], dtype=np.float64) for field in NUTRITION_FIELDS
+        }
+
+        calories = group_sum(user, columns['calories'], n_users)
+        protein = group_sum(user, columns['protein'], n_users)
+        fat = group_sum(user, columns['fat'], n_users)
+        fiber = group_mean(user, columns['fiber'], n_users)
+        sugar = group_mean(user, columns['sugar'], n_users)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            protein_ratio = np.where(calories > 0, protein * 4 / calories, np.nan)
+            fat_ratio = np.where(calories > 0, fat * 9 / calories, np.nan)
+
+        # Targets: ~25% calories from protein, 25-35% from fat, 8g+ fiber and
+        # no more than ~10g sugar per meal
+        component_scores = np.vstack([
+            np.clip(100 - np.abs(protein_ratio - 0.25) * 400, 0, 100),
+            np.clip(100 - np.maximum(0, np.abs(fat_ratio - 0.30) - 0.05) * 400, 0, 100),
+            np.clip(fiber / 8 * 100, 0, 100),
+            np.clip(100 - np.maximum(0, sugar - 10) * 4, 0, 100)
+        ])
+
+        available = ~np.isnan(component_scores)
+        counts = available.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            score = np.where(
+                counts > 0, np.where(available, component_scores, 0).sum(axis=0) / counts, np.nan
+            )
+
+        return score, {'protein_ratio': protein_ratio, 'fiber': fiber, 'sugar': sugar}
+
+    def to_score(self, value):
+        """Round a component score for display; None when there was no data"""
+        return None if np.isnan(value) else round(float(value), 1)
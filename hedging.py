@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import metrics
+
+DEFAULT_QUANTILE = 0.95
+DEFAULT_DELAY = 1.0       # Hedge delay until enough latencies have been seen
+MIN_DELAY = 0.05
+MIN_SAMPLES = 20
+LATENCY_WINDOW = 256      # Recent successful call latencies kept per endpoint
+HEDGE_MAX_WORKERS = 16
+
+_hedgers = {}
+_hedgers_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class Hedger:
+    """Duplicate an idempotent call that runs past the endpoint's recent p95
+
+    The first attempt starts right away; if it hasn't finished after
+    delay() seconds a second identical attempt starts, and whichever
+    succeeds first wins. The loser is left to finish (its own timeout
+    bounds it). allow() is asked before each hedge, e.g. to check the
+    rate limiter has a spare token.
+    """
+
+    def __init__(self, name, quantile=DEFAULT_QUANTILE, default_delay=DEFAULT_DELAY,
+                 min_delay=MIN_DELAY, min_samples=MIN_SAMPLES, window=LATENCY_WINDOW):
+        self.name = name
+        self.quantile = quantile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        """Seconds to wait before hedging: the recent latency quantile"""
+        with self._lock:
+            samples = sorted(self.latencies)
+        if len(samples) < self.min_samples:
+            return self.default_delay
+        return max(self.min_delay, samples[int(self.quantile * (len(samples) - 1))])
+
+    def call(self, func, *args, allow=None):
+        executor = get_hedge_executor()
+        attempts = [executor.submit(self.timed, func, *args)]
+
+        done, _ = wait(attempts, timeout=self.delay())
+        if not done and (allow is None or allow()):
+            metrics.increment(metrics.HEDGED, endpoint=self.name)
+            attempts.append(executor.submit(self.timed, func, *args))
+
+        pending = set(attempts)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for attempt in done:
+                if attempt.exception() is None:
+                    return attempt.result()
+                error = attempt.exception()
+        raise error
+
+    def timed(self, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        with self._lock:
+            self.latencies.append(time.perf_counter() - started)
+        return result
+
+
+def get_hedge_executor():
+    """Return the process-wide pool hedged attempts run on"""
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=HEDGE_MAX_WORKERS, thread_name_prefix='wellsync-hedge'
+                )
+    return _executor
+
+
+def get_hedger(name, **options):
+    """Return the process-wide hedger for an endpoint, creating it on first use"""
+    hedger = _hedgers.get(name)
+    if hedger is None:
+        with _hedgers_lock:
+            hedger = _hedgers.get(name)
+            if hedger is None:
+                hedger = _hedgers[name] = Hedger(name, **options)
+    return hedger
@@ -0,0 +1,143 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Defaults for the shared LogMeal client
+DEFAULT_POOL_CONNECTIONS = 10   # Number of host pools kept alive
+DEFAULT_POOL_MAXSIZE = 20       # Max open connections per host
+DEFAULT_POOL_TIMEOUT = 10       # Seconds to wait for a free connection when blocking
+
+_session = None
+_session_options = None
+_session_lock = threading.Lock()
+
+
+def with_pool_timeout(pool_class, pool_timeout):
+    """pool_class whose blocking connection checkout gives up after pool_timeout
+
+    urllib3 waits forever for a free connection in a blocking pool unless
+    each urlopen passes pool_timeout, which requests never does; past the
+    timeout it raises EmptyPoolError instead.
+    """
+    class BoundedPool(pool_class):
+        def _get_conn(self, timeout=None):
+            return super()._get_conn(timeout=pool_timeout if timeout is None else timeout)
+
+    return BoundedPool
+
+
+class BoundedPoolAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools wait at most pool_timeout for a connection"""
+
+    def __init__(self, pool_timeout=DEFAULT_POOL_TIMEOUT, **kwargs):
+        self.pool_timeout = pool_timeout  # Needed by init_poolmanager below
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': with_pool_timeout(HTTPConnectionPool, self.pool_timeout),
+            'https': with_pool_timeout(HTTPSConnectionPool, self.pool_timeout)
+        }
+
+
+def create_session(pool_connections=DEFAULT_POOL_CONNECTIONS,
+                   pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                   pool_block=True,
+                   pool_timeout=DEFAULT_POOL_TIMEOUT):
+    """Create a connection-pooled, keep-alive session
+
+    The session never retries: each request is sent once and its failure
+    goes straight to the caller. LogMeal calls run through circuit
+    breakers, which must see every attempt, and a 429 is backpressure to
+    surface, not something to sleep out on a worker thread.
+    """
+    # pool_block caps each host at pool_maxsize connections instead of
+    # opening throwaway ones under bursts; pool_timeout bounds the wait
+    adapter = BoundedPoolAdapter(
+        pool_timeout=pool_timeout,
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block
+    )
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Connection': 'keep-alive'})
+    return session
+
+
+def get_session(**pool_options):
+    """Return the process-wide pooled session, creating it on first use
+
+    pool_options (create_session arguments) only take effect on creation.
+    Asking for different options once the session exists raises
+    ValueError - call reset_session() first to rebuild it.
+    """
+    global _session, _session_options
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session(**pool_options)
+                _session_options = pool_options
+                return _session
+
+    if pool_options and pool_options != _session_options:
+        raise ValueError(
+            f"Shared session already created with {_session_options or 'defaults'}; "
+            f"call reset_session() before requesting {pool_options}"
+        )
+    return _session
+
+
+def reset_session():
+    """Close the shared session so the next call builds a fresh pool"""
+    global _session, _session_options
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _session_options = None
+
+
+def get_pool_stats():
+    """Connection pool hit/miss counters for the shared session
+
+    A miss is a new connection (TCP+TLS handshake); every other request
+    served by a pool reused a keep-alive connection and counts as a hit.
+    """
+    stats = {'hits': 0, 'misses': 0, 'requests': 0, 'hosts': {}}
+    if _session is None:
+        return stats
+
+    seen = set()
+    for adapter in _session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+
+            misses = pool.num_connections
+            requests_made = pool.num_requests
+            hits = max(0, requests_made - misses)
+
+            stats['hosts'][f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                'hits': hits,
+                'misses': misses,
+                'requests': requests_made
+            }
+            stats['hits'] += hits
+            stats['misses'] += misses
+            stats['requests'] += requests_made
+
+    return stats
@@ -0,0 +1,118 @@
+import io
+import threading
+import time
+
+from PIL import Image, ImageOps
+
+DEFAULT_MAX_EDGE = 1024   # LogMeal recognition gains nothing above ~1k px
+DEFAULT_JPEG_QUALITY = 85
+EXIF_ORIENTATION = 0x0112
+
+# JPEG segments that carry metadata rather than pixels: APP1 (EXIF, XMP),
+# APP13 (IPTC) and comments. JFIF, ICC and Adobe segments are kept.
+METADATA_MARKERS = {0xE1, 0xED, 0xFE}
+START_OF_SCAN = 0xDA
+
+_totals = {'images': 0, 'original_bytes': 0, 'upload_bytes': 0, 'elapsed_ms': 0.0}
+_totals_lock = threading.Lock()
+
+
+def prepare_image_for_upload(image_bytes, max_edge=DEFAULT_MAX_EDGE,
+                             quality=DEFAULT_JPEG_QUALITY):
+    """Downscale and re-encode an image before upload
+
+    Decodes once, applies the EXIF orientation, shrinks the longest edge to
+    max_edge, and re-encodes as a baseline JPEG without EXIF metadata.
+    Returns (upload_bytes, stats). An upright JPEG the re-encode wouldn't
+    shrink (small, already well-compressed photos) is sent as the original
+    with its metadata segments cut out instead - never with its EXIF.
+    Bytes that can't be decoded are passed through unchanged.
+    """
+    started = time.perf_counter()
+
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        upright_jpeg = image.format == 'JPEG' and image.getexif().get(EXIF_ORIENTATION, 1) == 1
+        # Let the JPEG decoder skip straight to a nearby scale (1/2, 1/4, 1/8)
+        image.draft('RGB', (max_edge, max_edge))
+        image = ImageOps.exif_transpose(image)
+
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=quality, optimize=True)
+        upload_bytes = output.getvalue()
+        size = image.size
+
+        if upright_jpeg:
+            stripped = strip_jpeg_metadata(image_bytes)
+            if stripped is not None and len(stripped) <= len(upload_bytes):
+                upload_bytes = stripped
+    except Exception:
+        upload_bytes = image_bytes
+        size = None
+
+    stats = {
+        'original_bytes': len(image_bytes),
+        'upload_bytes': len(upload_bytes),
+        'bytes_saved': len(image_bytes) - len(upload_bytes),
+        'elapsed_ms': (time.perf_counter() - started) * 1000,
+        'size': size
+    }
+    record_prep_stats(stats)
+    return upload_bytes, stats
+
+
+def strip_jpeg_metadata(jpeg_bytes):
+    """JPEG bytes without EXIF/XMP/IPTC segments or comments, not re-encoded
+
+    Returns None if the header segments can't be parsed.
+    """
+    if jpeg_bytes[:2] != b'\xff\xd8':
+        return None
+
+    parts = [jpeg_bytes[:2]]
+    pos = 2
+    while pos + 4 <= len(jpeg_bytes):
+        if jpeg_bytes[pos] != 0xFF:
+            return None
+        marker = jpeg_bytes[pos + 1]
+        if marker == 0xFF:  # Fill byte before a marker
+            pos += 1
+            continue
+        if marker == START_OF_SCAN:
+            # Entropy-coded data and the trailer follow; copied as is
+            parts.append(jpeg_bytes[pos:])
+            return b''.join(parts)
+
+        length = int.from_bytes(jpeg_bytes[pos + 2:pos + 4], 'big')
+        end = pos + 2 + length
+        if length < 2 or end > len(jpeg_bytes):
+            return None
+        if marker not in METADATA_MARKERS:
+            parts.append(jpeg_bytes[pos:end])
+        pos = end
+
+    return None
+
+
+def record_prep_stats(stats):
+    with _totals_lock:
+        _totals['images'] += 1
+        _totals['original_bytes'] += stats['original_bytes']
+        _totals['upload_bytes'] += stats['upload_bytes']
+        _totals['elapsed_ms'] += stats['elapsed_ms']
+
+
+def get_prep_stats():
+    """Process-wide totals: images prepared, bytes saved and time spent"""
+    with _totals_lock:
+        totals = dict(_totals)
+
+    totals['bytes_saved'] = totals['original_bytes'] - totals['upload_bytes']
+    totals['avg_elapsed_ms'] = (
+        totals['elapsed_ms'] / totals['images'] if totals['images'] else 0.0
+    )
+    return totals
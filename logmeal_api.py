@@ -1,80 +1,285 @@
-import requests
 import streamlit as st
-from PIL import Image
-import io
+import os
+
+from circuit_breaker import CircuitOpenError, get_circuit_breaker
+from hedging import get_hedger
+from http_session import get_session
+from image_prep import prepare_image_for_upload
+import metrics
+from nutrition_cache import get_nutrition_cache
+from parallel import imap_bounded, map_bounded
+from rate_limit import RateLimitExceeded, api_key_bucket, get_rate_limiter, retry_after_seconds
+from recognition_cache import get_recognition_cache
+from single_flight import get_single_flight
+
+DEFAULT_BASE_URL = "https://api.logmeal.com/v2"
+
+def resolve_base_url(base_url=None):
+    """Explicit base_url, else $LOGMEAL_BASE_URL (e.g. a stand-in server), else LogMeal"""
+    return (base_url or os.environ.get('LOGMEAL_BASE_URL') or DEFAULT_BASE_URL).rstrip('/')
 
 class LogMealAPI:
-    def __init__(self):
+    def __init__(self, max_workers=6, nutrition_timeout=15, nutrition_deadline=20,
+                 nutrition_cache=None, recognition_cache=None,
+                 max_image_edge=1024, jpeg_quality=85, base_url=None,
+                 rate_limiter=None, single_flight=None, hedge_nutrition=True,
+                 client_name='logmeal_api'):
         self.api_key = st.secrets["LOGMEAL_API_KEY"]  # Set in .streamlit/secrets.toml
-        self.base_url = "https://api.logmeal.com/v2"
+        self.base_url = resolve_base_url(base_url)
+        # Shared keep-alive connection pool (retry-free: every call below
+        # goes through a circuit breaker, which has to see each attempt)
+        self.session = get_session()
+        
+        # Nutrition lookup fan-out: concurrent calls, per-call and per-meal limits
+        self.max_workers = max_workers
+        self.nutrition_timeout = nutrition_timeout
+        self.nutrition_deadline = nutrition_deadline
+        
+        # Nutrition facts per food_id rarely change - serve repeats from cache
+        self.nutrition_cache = nutrition_cache or get_nutrition_cache()
+        
+        # Resubmitted photos reuse the earlier recognition response
+        self.recognition_cache = recognition_cache or get_recognition_cache()
+        
+        # Uploads are downscaled and re-encoded before hitting the network
+        self.max_image_edge = max_image_edge
+        self.jpeg_quality = jpeg_quality
+        
+        # LogMeal quotas are per API key: one token bucket per key, shared by
+        # every thread and worker process
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.rate_limit_bucket = api_key_bucket('logmeal', self.api_key)
+        
+        # Concurrent requests for the same photo or food_id share one call
+        self.single_flight = single_flight or get_single_flight()
+        
+        # While an endpoint keeps failing or stalling, scans fail fast
+        # instead of each waiting out the timeout
+        recognition_url = f"{self.base_url}/recognition/complete"
+        nutrition_url = f"{self.base_url}/nutrition/recipe/nutritionalInfo"
+        self.recognition_circuit = get_circuit_breaker(recognition_url, excluded=(RateLimitExceeded,))
+        self.nutrition_circuit = get_circuit_breaker(nutrition_url, excluded=(RateLimitExceeded,))
+        
+        # Nutrition lookups still running past the recent p95 get a duplicate
+        self.nutrition_hedger = get_hedger(nutrition_url) if hedge_nutrition else None
+        
+        # Label for this client's scan timings and fallback counts
+        self.client_name = client_name
         
     def analyze_food_image(self, image_bytes):
         """Main function to analyze food from image"""
+        try:
+            return self.run_food_analysis(image_bytes)
+            
+        except RateLimitExceeded:
+            raise  # Backpressure for the caller to show - not fallback data
+            
+        except Exception as e:
+            metrics.increment(metrics.FALLBACKS, source=self.client_name)
+            st.error(f"Food API Error: {str(e)}")
+            return self.get_fallback_nutrition()
+    
+    def run_food_analysis(self, image_bytes):
+        """Recognize foods and total their nutrition, raising on API failure
+        
+        food_nutrition holds each food's own facts (None if LogMeal has
+        none), aligned with foods, for callers that weight them differently.
+        """
         headers = {
             'Authorization': f'Bearer {self.api_key}',
         }
         
+        with metrics.timer(metrics.SCAN_SECONDS, client=self.client_name):
+            # Step 1: Food Recognition
+            recognition_data = self.recognize_food(image_bytes, headers)
+            foods = recognition_data.get('recognition_results', [])
+            
+            # Step 2: Get Nutrition Data
+            food_nutrition = self.fetch_nutrition_facts(foods, headers)
+        
+        return self.build_analysis_result(recognition_data, food_nutrition)
+    
+    def build_analysis_result(self, recognition_data, food_nutrition):
+        """Result dict of a successful analysis (shared with AsyncLogMealAPI)"""
+        foods = recognition_data.get('recognition_results', [])
+        return {
+            'success': True,
+            'foods': foods,
+            'nutrition': self.total_nutrition(foods, food_nutrition),
+            'food_nutrition': food_nutrition,
+            'confidence': self.calculate_confidence(recognition_data)
+        }
+    
+    def analyze_food_images(self, images, max_workers=4, ordered=True):
+        """Analyze many meal images, streaming results as they complete
+        
+        Yields one dict per image with its index, success flag, the
+        analysis result, the error message on failure and elapsed_ms.
+        Failures are reported as-is rather than replaced by fallback data.
+        """
+        for index, _, result, error, elapsed_ms in imap_bounded(
+            self.run_food_analysis, images, max_workers=max_workers, ordered=ordered
+        ):
+            yield {
+                'index': index,
+                'success': error is None,
+                'result': result,
+                'error': str(error) if error is not None else None,
+                'elapsed_ms': elapsed_ms
+            }
+    
+    def recognize_food(self, image_bytes, headers):
+        """Run food recognition, served from cache for repeated images"""
+        cache_key = self.recognition_cache.make_key(image_bytes)
+        recognition_data = self.recognition_cache.get(cache_key)
+        if recognition_data is not None:
+            return recognition_data
+        
+        return self.single_flight.do(
+            ('recognition', self.base_url, cache_key.digest),
+            self.request_recognition, image_bytes, cache_key, headers
+        )
+    
+    def request_recognition(self, image_bytes, cache_key, headers):
+        """Recognize a photo through the endpoint's circuit breaker and cache the response"""
+        recognition_data = self.recognition_circuit.call(self.post_recognition, image_bytes, headers)
+        self.recognition_cache.put(cache_key, recognition_data)
+        return recognition_data
+    
+    def post_recognition(self, image_bytes, headers):
+        """Upload a photo to /recognition/complete, raising on any non-200"""
+        self.rate_limiter.acquire(self.rate_limit_bucket)
+        
+        with metrics.timer(metrics.SCAN_STAGE_SECONDS, client=self.client_name, stage='prepare_image'):
+            upload_bytes, _ = prepare_image_for_upload(
+                image_bytes, max_edge=self.max_image_edge, quality=self.jpeg_quality
+            )
         files = {
-            'image': ('meal.jpg', image_bytes, 'image/jpeg')
+            'image': ('meal.jpg', upload_bytes, 'image/jpeg')
         }
         
-        try:
-            # Step 1: Food Recognition
-            response = requests.post(
+        with metrics.timer(metrics.OUTBOUND_SECONDS, service='logmeal', endpoint='recognition') as span:
+            response = self.session.post(
                 f"{self.base_url}/recognition/complete",
                 headers=headers,
                 files=files,
                 timeout=30
             )
-            
-            if response.status_code == 200:
-                recognition_data = response.json()
-                
-                # Step 2: Get Nutrition Data
-                nutrition_data = self.get_nutrition_details(recognition_data, headers)
-                
-                return {
-                    'success': True,
-                    'foods': recognition_data.get('recognition_results', []),
-                    'nutrition': nutrition_data,
-                    'confidence': self.calculate_confidence(recognition_data)
-                }
-            else:
-                return self.get_fallback_nutrition()
-                
-        except Exception as e:
-            st.error(f"Food API Error: {str(e)}")
-            return self.get_fallback_nutrition()
+            span.set(status=response.status_code)
+        
+        if response.status_code == 429:
+            raise RateLimitExceeded(retry_after_seconds(response))
+        if response.status_code != 200:
+            raise Exception(f"LogMeal API error: {response.status_code}")
+        
+        return response.json()
     
     def get_nutrition_details(self, recognition_data, headers):
         """Get detailed nutrition for recognized foods"""
+        foods = recognition_data.get('recognition_results', [])
+        return self.total_nutrition(foods, self.fetch_nutrition_facts(foods, headers))
+    
+    def fetch_nutrition_facts(self, foods, headers):
+        """Nutrition facts per recognized food, in order; None where LogMeal has none
+        
+        Raises if any lookup failed or missed the deadline.
+        """
+        # Look up all foods in parallel; results come back in input order
+        with metrics.timer(metrics.SCAN_STAGE_SECONDS, client=self.client_name, stage='nutrition'):
+            nutrition_results = map_bounded(
+                lambda food: self.fetch_food_nutrition(food.get('food_id', ''), headers),
+                foods,
+                max_workers=self.max_workers,
+                deadline=self.nutrition_deadline,
+                return_exceptions=True
+            )
+        
+        # A partial total would understate the meal - reject it as a whole,
+        # preferring an error that says when to retry
+        failed = [result for result in nutrition_results if isinstance(result, Exception)]
+        backpressure = [e for e in failed if isinstance(e, (RateLimitExceeded, CircuitOpenError))]
+        if backpressure:
+            raise max(backpressure, key=lambda e: e.retry_after)
+        if failed:
+            raise failed[0]
+        
+        return nutrition_results
+    
+    def total_nutrition(self, foods, food_nutrition):
+        """Confidence-weighted nutrition totals for a meal"""
         total_nutrition = {
             'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0,
             'fiber': 0, 'sugar': 0, 'sodium': 0
         }
         
-        for food in recognition_data.get('recognition_results', []):
-            try:
-                nutrition_response = requests.get(
-                    f"{self.base_url}/nutrition/recipe/nutritionalInfo",
-                    headers=headers,
-                    params={'food_id': food.get('food_id', '')},
-                    timeout=15
-                )
-                
-                if nutrition_response.status_code == 200:
-                    nutrition = nutrition_response.json()
-                    confidence_weight = food.get('prob', 0.5)
-                    
-                    # Accumulate nutrition values
-                    for key in total_nutrition.keys():
-                        total_nutrition[key] += nutrition.get(key, 0) * confidence_weight
-                        
-            except Exception as e:
+        for food, nutrition in zip(foods, food_nutrition):
+            if nutrition is None:
                 continue
+            
+            confidence_weight = food.get('prob', 0.5)
+            
+            # Accumulate nutrition values
+            for key in total_nutrition.keys():
+                total_nutrition[key] += nutrition.get(key, 0) * confidence_weight
         
         return total_nutrition
     
+    def fetch_food_nutrition(self, food_id, headers):
+        """Fetch nutrition facts for a single food, or None if unavailable"""
+        cached = self.nutrition_cache.get(food_id) if food_id else None
+        if cached is not None:
+            return cached
+        
+        return self.single_flight.do(
+            ('nutrition', self.base_url, food_id),
+            self.request_food_nutrition, food_id, headers
+        )
+    
+    def request_food_nutrition(self, food_id, headers):
+        """Look up one food through the endpoint's circuit breaker and cache the facts"""
+        nutrition = self.nutrition_circuit.call(self.get_food_nutrition, food_id, headers)
+        if nutrition is not None and food_id:
+            self.nutrition_cache.put(food_id, nutrition)
+        return nutrition
+    
+    def get_food_nutrition(self, food_id, headers):
+        """Rate-limited nutrition lookup, hedged when it runs slow"""
+        self.rate_limiter.acquire(self.rate_limit_bucket)
+        if self.nutrition_hedger is None:
+            return self.send_nutrition_request(food_id, headers)
+        
+        # A hedge is a real request too, so it only goes out if a token is free
+        return self.nutrition_hedger.call(
+            self.send_nutrition_request, food_id, headers,
+            allow=lambda: self.rate_limiter.try_acquire(self.rate_limit_bucket) == 0
+        )
+    
+    def send_nutrition_request(self, food_id, headers):
+        """One nutrition request: facts, None for an unknown food, raises on server errors"""
+        with metrics.timer(metrics.OUTBOUND_SECONDS, service='logmeal', endpoint='nutrition') as span:
+            nutrition_response = self.session.get(
+                f"{self.base_url}/nutrition/recipe/nutritionalInfo",
+                headers=headers,
+                params={'food_id': food_id},
+                timeout=self.nutrition_timeout
+            )
+            span.set(status=nutrition_response.status_code)
+        
+        if nutrition_response.status_code == 429:
+            raise RateLimitExceeded(retry_after_seconds(nutrition_response))
+        if nutrition_response.status_code >= 500:
+            raise Exception(f"LogMeal API error: {nutrition_response.status_code}")
+        if nutrition_response.status_code == 200:
+            return nutrition_response.json()
+        return None
+    
+    def calculate_confidence(self, recognition_data):
+        """Average recognition probability across detected foods"""
+        foods = recognition_data.get('recognition_results', [])
+        if not foods:
+            return 0
+        return sum(food.get('prob', 0) for food in foods) / len(foods)
+    
     def get_fallback_nutrition(self):
         """Fallback nutrition data if API fails"""
         return {
@@ -1,9 +1,19 @@
 import streamlit as st
 import sys
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 import random
 
+from app_cache import (cached_fit_data, cached_meal_data, data_version, get_food_api,
+                       invalidate, throttled_fit_sync)
+from meal_store import get_meal_store
+import metrics
+import profiling
+from rate_limit import RateLimitExceeded
+from recognition_cache import content_hash
+from scan_jobs import submit_scan, wait_for_scan
+from user_identity import resolve_user_id
+
 # Add project root to path for imports
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
@@ -12,6 +22,11 @@ sys.path.append(parent_dir)
 class WellSyncSmartApp:
     def __init__(self):
         self.setup_page()
+        # Meal history is kept on disk so it outlives the session
+        self.meal_store = get_meal_store()
+        # Outbound call timings and fallback counts, served on a local port
+        if metrics.ENABLED:
+            metrics.start_metrics_server()
         self.init_session_state()
     
     def setup_page(self):
@@ -89,19 +104,39 @@ class WellSyncSmartApp:
                 'google_fit': False
             }
         
+        # Stored meals and cached reads are keyed by this id: the Google
+        # account once connected, else an anonymous id kept in the page URL
+        user_id = resolve_user_id()
         if 'user_data' not in st.session_state:
             st.session_state.user_data = {
-                'meals': [],
+                'user_id': user_id,
                 'health_data': {},
                 'setup_complete': False,
-                'total_meals_logged': 0
+                'total_meals_logged': self.meal_store.count_meals(user_id)
             }
+        elif st.session_state.user_data['user_id'] != user_id:
+            st.session_state.user_data['user_id'] = user_id
+            st.session_state.user_data['total_meals_logged'] = self.meal_store.count_meals(user_id)
         
         if 'demo_mode' not in st.session_state:
             st.session_state.demo_mode = True  # Use demo data for now
+        
+        if 'scan_jobs' not in st.session_state:
+            st.session_state.scan_jobs = {}  # Photo hash -> background analysis
+        if 'scan_polls' not in st.session_state:
+            st.session_state.scan_polls = (None, 0)  # (photo hash, reruns spent waiting)
     
     def main(self):
         """Main application entry point"""
+        # WELLSYNC_PROFILE: cProfile this rerun and save the results to disk
+        if profiling.ENABLED:
+            with profiling.get_rerun_profiler().profile_rerun():
+                self.render_app()
+        else:
+            self.render_app()
+    
+    def render_app(self):
+        """Permission screen until access is granted, then the application"""
         # Check if all permissions are granted
         if not self.check_permissions():
             self.render_permission_screen()
@@ -227,57 +262,91 @@ class WellSyncSmartApp:
             with col2:
                 st.markdown("### 🔍 AI Analysis Results")
                 
-                # Simulate food recognition processing
-                with st.spinner("🤖 AI is analyzing your food..."):
-                    import time
-                    time.sleep(2)  # Simulate processing time
-                    
-                    # Generate demo food recognition results
-                    food_results = self.generate_demo_food_analysis()
-                
-                # Display detected foods
-                st.markdown("**🍽️ Detected Foods:**")
-                for food in food_results['foods']:
-                    confidence = food['confidence']
-                    confidence_color = "🟢" if confidence > 80 else "🟡" if confidence > 60 else "🔴"
-                    st.markdown(f"{confidence_color} **{food['name']}** ({confidence:.1f}% confidence)")
-                
-                # Display nutrition information
-                st.markdown("**📊 Nutrition Analysis:**")
-                nutrition = food_results['nutrition']
-                
-                # Create nutrition metrics
-                col_a, col_b = st.columns(2)
+                # Analysis runs in the background so the page paints right away
+                picture_bytes = picture.getvalue()
+                scan_key = content_hash(picture_bytes)
+                scan = submit_scan(
+                    st.session_state.scan_jobs, scan_key,
+                    self.analyze_meal_photo, picture_bytes, self.get_live_food_api()
+                )
                 
-                with col_a:
-                    st.metric("Calories", f"{nutrition['calories']:.0f} kcal")
-                    st.metric("Protein", f"{nutrition['protein']:.1f}g")
-                    st.metric("Fiber", f"{nutrition['fiber']:.1f}g")
-                
-                with col_b:
-                    st.metric("Carbs", f"{nutrition['carbs']:.1f}g")
-                    st.metric("Fat", f"{nutrition['fat']:.1f}g")
-                    st.metric("Sugar", f"{nutrition['sugar']:.1f}g")
-                
-                # Log meal button
-                if st.button("✅ Log This Meal", type="primary"):
-                    self.save_meal_to_profile(food_results)
-                    st.success("🎉 Meal logged successfully!")
-                    
-                    # Generate personalized health tip
-                    health_tip = self.generate_health_tip_from_nutrition(nutrition)
-                    st.info(f"💡 **Health Insight:** {health_tip}")
-                    
-                    # Update total meals counter
-                    st.session_state.user_data['total_meals_logged'] += 1
+                if scan.done():
+                    food_results = self.get_scan_results(scan)
+                    if food_results is None:
+                        # Rate limited - forget the job so the next rerun retries it
+                        st.session_state.scan_jobs.pop(scan_key, None)
+                        st.button("🔄 Retry analysis")
+                    else:
+                        self.render_scan_results(food_results)
+                else:
+                    st.info("🤖 AI is analyzing your food...")
+            
+            # Poll until the background analysis finishes, backing off while it runs
+            if not scan.done():
+                polled_key, polls = st.session_state.scan_polls
+                if polled_key != scan_key:
+                    polls = 0
+                st.session_state.scan_polls = (scan_key, polls + 1)
+                wait_for_scan(scan, polls)
+                st.rerun()
+    
+    def render_scan_results(self, food_results):
+        """Detected foods, nutrition metrics and the log button for one scan"""
+        # Display detected foods
+        st.markdown("**🍽️ Detected Foods:**")
+        for food in food_results['foods']:
+            confidence = food['confidence']
+            confidence_color = "🟢" if confidence > 80 else "🟡" if confidence > 60 else "🔴"
+            st.markdown(f"{confidence_color} **{food['name']}** ({confidence:.1f}% confidence)")
+        
+        # Display nutrition information
+        st.markdown("**📊 Nutrition Analysis:**")
+        nutrition = food_results['nutrition']
+        
+        # Create nutrition metrics
+        col_a, col_b = st.columns(2)
+        
+        with col_a:
+            st.metric("Calories", f"{nutrition['calories']:.0f} kcal")
+            st.metric("Protein", f"{nutrition['protein']:.1f}g")
+            st.metric("Fiber", f"{nutrition['fiber']:.1f}g")
+        
+        with col_b:
+            st.metric("Carbs", f"{nutrition['carbs']:.1f}g")
+            st.metric("Fat", f"{nutrition['fat']:.1f}g")
+            st.metric("Sugar", f"{nutrition['sugar']:.1f}g")
+        
+        # Log meal button
+        if st.button("✅ Log This Meal", type="primary"):
+            self.save_meal_to_profile(food_results)
+            st.success("🎉 Meal logged successfully!")
+            
+            # Generate personalized health tip
+            health_tip = self.generate_health_tip_from_nutrition(nutrition)
+            st.info(f"💡 **Health Insight:** {health_tip}")
+            
+            # Update total meals counter
+            st.session_state.user_data['total_meals_logged'] += 1
     
     def render_health_dashboard_page(self):
         """Comprehensive health overview dashboard"""
         st.markdown("# 📊 Health Dashboard")
         st.markdown("*Your complete health overview powered by AI*")
         
-        # Get health data (demo version)
-        health_data = self.get_demo_health_data()
+        user_id = st.session_state.user_data['user_id']
+        today = datetime.now().date().isoformat()
+        week_start = (datetime.now().date() - timedelta(days=6)).isoformat()
+        meal_version = data_version(user_id, 'meals')
+        
+        # Live Google Fit days when connected (synced at most once per TTL),
+        # otherwise demo data - held steady until the data version changes
+        fit_days = self.get_fit_days(user_id)
+        fit_version = data_version(user_id, 'fit')
+        if fit_days:
+            health_data = self.build_health_snapshot(fit_days[-1])
+        else:
+            health_data = cached_fit_data('demo_health', user_id, today, today, fit_version,
+                                          self.get_demo_health_data)
         
         # Key health metrics
         st.markdown("### 🎯 Key Health Metrics")
@@ -306,17 +375,10 @@ class WellSyncSmartApp:
         # Health trends chart
         st.markdown("### 📈 Weekly Health Trends")
         
-        # Generate sample chart data
-        import pandas as pd
-        import numpy as np
-        
-        dates = pd.date_range(end=datetime.now().date(), periods=7, freq='D')
-        chart_data = pd.DataFrame({
-            'Date': dates,
-            'Steps': np.random.randint(6000, 12000, 7),
-            'Sleep Hours': np.random.uniform(6.5, 9.0, 7),
-            'Health Score': np.random.randint(70, 90, 7)
-        })
+        chart_data = cached_fit_data(
+            'weekly_trends' if fit_days else 'demo_weekly_trends', user_id, week_start, today,
+            fit_version, lambda: self.build_weekly_trends(fit_days)
+        )
         
         # Display multiple charts
         col1, col2 = st.columns(2)
@@ -332,8 +394,21 @@ class WellSyncSmartApp:
         # Recent meals section
         st.markdown("### 🍽️ Recent Meals")
         
-        if st.session_state.user_data['meals']:
-            for i, meal in enumerate(st.session_state.user_data['meals'][-3:]):
+        # Today's totals come from the per-day rollup, not the meal log
+        today_totals = cached_meal_data('day_totals', user_id, today, today, meal_version,
+                                        lambda: self.meal_store.day_totals(user_id, today))
+        if today_totals:
+            st.caption(
+                f"Today: {today_totals['meals']} meals · {today_totals['calories']:.0f} kcal · "
+                f"{today_totals['protein']:.1f}g protein · {today_totals['carbs']:.1f}g carbs · "
+                f"{today_totals['fat']:.1f}g fat"
+            )
+        
+        recent_meals = cached_meal_data('recent_meals', user_id, None, today, meal_version,
+                                        lambda: self.meal_store.recent_meals(user_id, limit=3))
+        
+        if recent_meals:
+            for i, meal in enumerate(reversed(recent_meals)):
                 with st.expander(f"Meal {i+1} - {meal['timestamp'][:10]}"):
                     col1, col2 = st.columns(2)
                     
@@ -481,12 +556,13 @@ class WellSyncSmartApp:
         col1, col2 = st.columns(2)
         
         with col1:
-            st.markdown(f"**Meals Logged:** {len(st.session_state.user_data['meals'])}")
+            st.markdown(f"**Meals Logged:** {self.meal_store.count_meals(st.session_state.user_data['user_id'])}")
             st.markdown(f"**Days Active:** {self.get_days_active()}")
         
         with col2:
             if st.button("🗑️ Clear All Meal Data"):
-                st.session_state.user_data['meals'] = []
+                self.meal_store.clear_user(st.session_state.user_data['user_id'])
+                invalidate(st.session_state.user_data['user_id'], 'meals')
                 st.session_state.user_data['total_meals_logged'] = 0
                 st.success("All meal data cleared!")
         
@@ -501,6 +577,40 @@ class WellSyncSmartApp:
             st.info("Live mode - using real API calls (coming in Hour 10-11)")
     
     # Helper methods
+    def get_live_food_api(self):
+        """Shared LogMeal client in live mode, None in demo mode"""
+        return None if st.session_state.demo_mode else get_food_api()
+    
+    def analyze_meal_photo(self, picture_bytes, food_api):
+        """Recognize a meal photo (runs on the scan executor, not the script thread)"""
+        if food_api is None:
+            return self.generate_demo_food_analysis()
+        
+        return self.to_scan_results(food_api.run_food_analysis(picture_bytes))
+    
+    def get_scan_results(self, scan):
+        """Results of a finished scan; None if rate limited, fallback nutrition if the API failed"""
+        try:
+            return scan.result()
+        except RateLimitExceeded as e:
+            # Backpressure, not an outage - say so instead of showing made-up nutrition
+            st.warning(f"⏳ Food analysis is busy right now - try again in {e.retry_after:.0f}s")
+            return None
+        except Exception as e:
+            metrics.increment(metrics.FALLBACKS, source='food_scanner')
+            st.error(f"Food API Error: {str(e)}")
+            return self.to_scan_results(get_food_api().get_fallback_nutrition())
+    
+    def to_scan_results(self, analysis):
+        """Convert a LogMeal analysis into the scanner's foods/nutrition shape"""
+        return {
+            'foods': [
+                {'name': food.get('name', 'Unknown'), 'confidence': food.get('prob', 0) * 100}
+                for food in analysis['foods']
+            ],
+            'nutrition': analysis['nutrition']
+        }
+    
     def generate_demo_food_analysis(self):
         """Generate realistic demo food analysis results"""
         demo_meals = [
@@ -547,13 +657,83 @@ class WellSyncSmartApp:
             }
         }
     
+    def get_fit_days(self, user_id, days_back=7):
+        """Per-day Google Fit rows (oldest first), or None when not connected
+        or the sync failed (the dashboard then shows demo data)"""
+        if 'google_fit_credentials' not in st.session_state:
+            return None
+        from google_fit_api import GoogleFitIntegration
+        
+        fit_api = GoogleFitIntegration()
+        start_day, today = (day.isoformat() for day in fit_api.recent_window(days_back))
+        try:
+            throttled_fit_sync(user_id, start_day, today,
+                               lambda: fit_api.sync_recent_days(user_id, days_back))
+        except Exception as e:
+            metrics.increment(metrics.FALLBACKS, source='google_fit_api')
+            st.warning(f"Using demo data: {str(e)}")
+            return None
+        
+        # Read after the sync, so a sync that just bumped the version is seen
+        health_data = cached_fit_data(
+            'recent_health', user_id, start_day, today, data_version(user_id, 'fit'),
+            lambda: fit_api.load_recent_health_data(user_id, days_back)
+        )
+        
+        sleep_hours = {day['date']: day['duration_hours'] for day in health_data['sleep_data']}
+        days = [
+            dict(day, sleep_hours=sleep_hours.get(day['date'], 0.0))
+            for day in health_data['fitness_data']
+        ]
+        return sorted(days, key=lambda day: day['date']) or None
+    
+    def build_health_snapshot(self, day):
+        """Dashboard metrics from one Google Fit day"""
+        return {
+            'fitness': {
+                'steps': int(day['steps']),
+                'active_minutes': int(day['active_minutes']),
+                'calories_burned': int(day['calories'])
+            },
+            'sleep': {
+                'duration': round(day['sleep_hours'], 1)
+            }
+        }
+    
+    def build_weekly_trends(self, fit_days=None):
+        """Chart data for the last 7 days - from Google Fit days, or sample data"""
+        import pandas as pd
+        import numpy as np
+        
+        if fit_days:
+            from health_analyzer import calculate_health_scores_frame
+            
+            frame = pd.DataFrame(fit_days)
+            return pd.DataFrame({
+                'Date': pd.to_datetime(frame['date']),
+                'Steps': frame['steps'],
+                'Sleep Hours': frame['sleep_hours'],
+                'Health Score': calculate_health_scores_frame(frame)
+            })
+        
+        dates = pd.date_range(end=datetime.now().date(), periods=7, freq='D')
+        return pd.DataFrame({
+            'Date': dates,
+            'Steps': np.random.randint(6000, 12000, 7),
+            'Sleep Hours': np.random.uniform(6.5, 9.0, 7),
+            'Health Score': np.random.randint(70, 90, 7)
+        })
+    
     def calculate_health_score(self, health_data):
         """Calculate unified health score"""
-        steps_score = min(100, (health_data['fitness']['steps'] / 10000) * 100)
-        sleep_score = max(0, 100 - abs(health_data['sleep']['duration'] - 8) * 12.5)
-        active_score = min(100, (health_data['fitness']['active_minutes'] / 60) * 100)
-        
-        return round((steps_score * 0.4 + sleep_score * 0.4 + active_score * 0.2))
+        from health_analyzer import calculate_health_scores
+        
+        # Single-row call into the batch scorer used for nightly runs
+        return int(calculate_health_scores(
+            [health_data['fitness']['steps']],
+            [health_data['sleep']['duration']],
+            [health_data['fitness']['active_minutes']]
+        )[0])
     
     def generate_ai_recommendations(self):
         """Generate AI-powered health recommendations"""
@@ -622,11 +802,8 @@ class WellSyncSmartApp:
             'date': datetime.now().strftime('%Y-%m-%d')
         }
         
-        st.session_state.user_data['meals'].append(meal_record)
-        
-        # Keep only last 50 meals
-        if len(st.session_state.user_data['meals']) > 50:
-            st.session_state.user_data['meals'] = st.session_state.user_data['meals'][-50:]
+        self.meal_store.add_meal(st.session_state.user_data['user_id'], meal_record)
+        invalidate(st.session_state.user_data['user_id'], 'meals')
     
     def generate_health_tip_from_nutrition(self, nutrition):
         """Generate personalized health tip based on meal nutrition"""
@@ -654,15 +831,7 @@ class WellSyncSmartApp:
     
     def get_days_active(self):
         """Calculate days active based on meal logging"""
-        if not st.session_state.user_data['meals']:
-            return 0
-        
-        unique_dates = set()
-        for meal in st.session_state.user_data['meals']:
-            date = meal['timestamp'][:10]  # Extract date part
-            unique_dates.add(date)
-        
-        return len(unique_dates)
+        return self.meal_store.count_days(st.session_state.user_data['user_id'])
 
 # Main application entry point
 if __name__ == "__main__":
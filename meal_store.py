@@ -0,0 +1,223 @@
+import json
+import os
+import sqlite3
+import threading
+
+from paths import DEFAULT_CACHE_DIR
+
+DEFAULT_DB_PATH = os.path.join(DEFAULT_CACHE_DIR, 'meal_store.sqlite3')
+
+NUTRIENT_COLUMNS = ['calories', 'protein', 'carbs', 'fat', 'fiber', 'sugar']
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+class MealStore:
+    """Append-only meal log per user, kept on disk
+
+    Meals get increasing ids, so "the last N meals" and paging further back
+    are keyset lookups on the (user_id, id) index - no matter how many years
+    of meals a user has, a page reads only its own rows.
+
+    Per-day nutrition totals and per-user meal/active-day counts are kept
+    up to date in the same transaction as each insert, so dashboard
+    metrics are primary-key reads rather than scans over the log.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = self.connect()
+
+    def connect(self):
+        if self.db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+
+        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS meals (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                day TEXT NOT NULL,
+                logged_at TEXT NOT NULL,
+                foods TEXT NOT NULL,
+                nutrition TEXT NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS meals_user_id ON meals (user_id, id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS meals_user_day ON meals (user_id, day)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS daily_nutrition (
+                user_id TEXT NOT NULL,
+                day TEXT NOT NULL,
+                meals INTEGER NOT NULL,
+                calories REAL NOT NULL,
+                protein REAL NOT NULL,
+                carbs REAL NOT NULL,
+                fat REAL NOT NULL,
+                fiber REAL NOT NULL,
+                sugar REAL NOT NULL,
+                PRIMARY KEY (user_id, day)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS meal_totals (
+                user_id TEXT PRIMARY KEY,
+                meals INTEGER NOT NULL,
+                active_days INTEGER NOT NULL
+            )
+        ''')
+
+        # Logs written before rollups existed get them built once
+        needs_rollups = conn.execute(
+            'SELECT EXISTS (SELECT 1 FROM meals) AND NOT EXISTS (SELECT 1 FROM meal_totals)'
+        ).fetchone()[0]
+        if needs_rollups:
+            self.rebuild_rollups(conn)
+
+        conn.commit()
+        return conn
+
+    def rebuild_rollups(self, conn):
+        """Recompute every rollup from the meal log"""
+        conn.execute('DELETE FROM daily_nutrition')
+        conn.execute('DELETE FROM meal_totals')
+
+        rows = conn.execute('SELECT user_id, day, nutrition FROM meals ORDER BY id').fetchall()
+        for user_id, day, nutrition in rows:
+            self.add_to_rollups(conn, user_id, day, json.loads(nutrition))
+
+    def add_to_rollups(self, conn, user_id, day, nutrition):
+        """Fold one meal into its day's totals and the user's counts"""
+        values = [float(nutrition.get(column) or 0) for column in NUTRIENT_COLUMNS]
+
+        new_day = conn.execute(
+            'INSERT OR IGNORE INTO daily_nutrition '
+            '(user_id, day, meals, calories, protein, carbs, fat, fiber, sugar) '
+            'VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?)',
+            (user_id, day, *values)
+        ).rowcount
+        if not new_day:
+            conn.execute(
+                'UPDATE daily_nutrition SET meals = meals + 1, '
+                'calories = calories + ?, protein = protein + ?, carbs = carbs + ?, '
+                'fat = fat + ?, fiber = fiber + ?, sugar = sugar + ? '
+                'WHERE user_id = ? AND day = ?',
+                (*values, user_id, day)
+            )
+
+        conn.execute(
+            'INSERT INTO meal_totals (user_id, meals, active_days) VALUES (?, 1, ?) '
+            'ON CONFLICT (user_id) DO UPDATE SET meals = meals + 1, '
+            'active_days = active_days + excluded.active_days',
+            (user_id, new_day)
+        )
+
+    def add_meal(self, user_id, meal_record):
+        """Append one meal ('timestamp', 'date', 'foods', 'nutrition'); returns its id"""
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO meals (user_id, day, logged_at, foods, nutrition) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (
+                    user_id,
+                    meal_record['date'],
+                    meal_record['timestamp'],
+                    json.dumps(meal_record['foods']),
+                    json.dumps(meal_record['nutrition'])
+                )
+            )
+            self.add_to_rollups(
+                self._conn, user_id, meal_record['date'], meal_record['nutrition']
+            )
+            self._conn.commit()
+        return cursor.lastrowid
+
+    def recent_meals(self, user_id, limit=3, before_id=None):
+        """Up to limit meals, newest first
+
+        Pass the smallest id of the previous page as before_id to page back.
+        """
+        query = 'SELECT id, day, logged_at, foods, nutrition FROM meals WHERE user_id = ?'
+        params = [user_id]
+        if before_id is not None:
+            query += ' AND id < ?'
+            params.append(before_id)
+        query += ' ORDER BY id DESC LIMIT ?'
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self.to_meal(row) for row in rows]
+
+    def meals_between(self, user_id, start_day, end_day):
+        """Meals logged on start_day..end_day (ISO dates, inclusive), oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id, day, logged_at, foods, nutrition FROM meals '
+                'WHERE user_id = ? AND day BETWEEN ? AND ? ORDER BY day, id',
+                (user_id, start_day, end_day)
+            ).fetchall()
+        return [self.to_meal(row) for row in rows]
+
+    def get_totals(self, user_id):
+        """{'meals', 'active_days'} for a user, from the rollup row"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT meals, active_days FROM meal_totals WHERE user_id = ?', (user_id,)
+            ).fetchone()
+        meals, active_days = row or (0, 0)
+        return {'meals': meals, 'active_days': active_days}
+
+    def count_meals(self, user_id):
+        return self.get_totals(user_id)['meals']
+
+    def count_days(self, user_id):
+        """Number of distinct days with at least one meal"""
+        return self.get_totals(user_id)['active_days']
+
+    def daily_totals(self, user_id, start_day, end_day):
+        """Per-day meal counts and nutrient totals for start_day..end_day, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT day, meals, calories, protein, carbs, fat, fiber, sugar '
+                'FROM daily_nutrition WHERE user_id = ? AND day BETWEEN ? AND ? ORDER BY day',
+                (user_id, start_day, end_day)
+            ).fetchall()
+        return [dict(zip(['date', 'meals'] + NUTRIENT_COLUMNS, row)) for row in rows]
+
+    def day_totals(self, user_id, day):
+        """Totals for one day, or None if nothing was logged"""
+        totals = self.daily_totals(user_id, day, day)
+        return totals[0] if totals else None
+
+    def clear_user(self, user_id):
+        with self._lock:
+            self._conn.execute('DELETE FROM meals WHERE user_id = ?', (user_id,))
+            self._conn.execute('DELETE FROM daily_nutrition WHERE user_id = ?', (user_id,))
+            self._conn.execute('DELETE FROM meal_totals WHERE user_id = ?', (user_id,))
+            self._conn.commit()
+
+    def to_meal(self, row):
+        meal_id, day, logged_at, foods, nutrition = row
+        return {
+            'id': meal_id,
+            'timestamp': logged_at,
+            'date': day,
+            'foods': json.loads(foods),
+            'nutrition': json.loads(nutrition)
+        }
+
+
+def get_meal_store():
+    """Return the process-wide meal store, creating it on first use"""
+    global _shared_store
+
+    if _shared_store is None:
+        with _shared_store_lock:
+            if _shared_store is None:
+                _shared_store = MealStore()
+    return _shared_store
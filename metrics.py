@@ -0,0 +1,276 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Off unless WELLSYNC_METRICS is set; disabled calls return before any work
+ENABLED = os.environ.get('WELLSYNC_METRICS', '').lower() in ('1', 'true', 'yes', 'on')
+DEFAULT_PORT = int(os.environ.get('WELLSYNC_METRICS_PORT', '9464'))
+
+# Series recorded by the API integrations
+OUTBOUND_SECONDS = 'wellsync_outbound_request_seconds'   # service, endpoint, status
+SCAN_SECONDS = 'wellsync_scan_seconds'                   # client, status
+SCAN_STAGE_SECONDS = 'wellsync_scan_stage_seconds'       # client, stage, status
+FIT_SECONDS = 'wellsync_fit_operation_seconds'           # client, operation, status
+CACHE_LOOKUPS = 'wellsync_cache_lookups_total'           # cache, result
+FALLBACKS = 'wellsync_fallbacks_total'                   # source
+RATE_LIMITED = 'wellsync_rate_limited_total'             # bucket
+COALESCED = 'wellsync_coalesced_requests_total'          # kind
+CIRCUIT_TRANSITIONS = 'wellsync_circuit_transitions_total'  # circuit, state
+CIRCUIT_REJECTED = 'wellsync_circuit_rejected_total'     # circuit
+HEDGED = 'wellsync_hedged_requests_total'                # endpoint
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_shared_metrics = None
+_shared_metrics_lock = threading.Lock()
+_server = None
+_server_lock = threading.Lock()
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram (Prometheus semantics)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """[(upper bound, observations <= bound)], ending with +Inf"""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class Metrics:
+    """Thread-safe registry of counters and histograms keyed by name + labels"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name, amount=1, labels=None):
+        key = (name, label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, labels=None):
+        key = (name, label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def histogram_sum(self, name):
+        """Total observed value of a histogram across all its label sets"""
+        with self._lock:
+            return sum(
+                histogram.sum for (series, _), histogram in self.histograms.items() if series == name
+            )
+
+    def snapshot(self):
+        """Plain-dict copy of every series, for JSON export"""
+        with self._lock:
+            return {
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+                'histograms': [
+                    {
+                        'name': name,
+                        'labels': dict(labels),
+                        'count': histogram.count,
+                        'sum': histogram.sum,
+                        'buckets': [
+                            ['+Inf' if bound == float('inf') else bound, count]
+                            for bound, count in histogram.cumulative()
+                        ]
+                    }
+                    for (name, labels), histogram in sorted(self.histograms.items())
+                ]
+            }
+
+    def to_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self.counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (series, labels), value in sorted(self.counters.items()):
+                    if series == name:
+                        lines.append(f"{name}{format_labels(labels)} {value}")
+
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (series, labels), histogram in sorted(self.histograms.items()):
+                    if series != name:
+                        continue
+                    for bound, count in histogram.cumulative():
+                        le = '+Inf' if bound == float('inf') else repr(float(bound))
+                        lines.append(
+                            f"{name}_bucket{format_labels(labels + (('le', le),))} {count}"
+                        )
+                    lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+class Span:
+    """Times a block into a histogram; use via timer()
+
+    Labels can be added inside the block with set() (e.g. the HTTP status).
+    status defaults to 'ok', or 'error' when the block raises.
+    """
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def set(self, **labels):
+        self.labels.update(labels)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        if exc_type is not None:
+            self.labels['status'] = 'error'
+        else:
+            self.labels.setdefault('status', 'ok')
+        self.registry.observe(self.name, elapsed, self.labels)
+        return False
+
+
+class NullSpan:
+    """Stand-in returned by timer() while metrics are disabled"""
+
+    def set(self, **labels):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+def label_key(labels):
+    """Hashable, order-independent form of a label dict"""
+    if not labels:
+        return ()
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def get_metrics():
+    """Return the process-wide registry, creating it on first use"""
+    global _shared_metrics
+
+    if _shared_metrics is None:
+        with _shared_metrics_lock:
+            if _shared_metrics is None:
+                _shared_metrics = Metrics()
+    return _shared_metrics
+
+
+def set_enabled(enabled):
+    """Turn recording on or off at runtime (e.g. from tests or benchmarks)"""
+    global ENABLED
+    ENABLED = bool(enabled)
+
+
+def timer(name, **labels):
+    """Context manager recording the block's duration in seconds"""
+    if not ENABLED:
+        return NULL_SPAN
+    return Span(get_metrics(), name, labels)
+
+
+def increment(name, amount=1, **labels):
+    """Add amount to a counter"""
+    if ENABLED:
+        get_metrics().increment(name, amount, labels)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        registry = get_metrics()
+        if self.path == '/metrics':
+            body = registry.to_prometheus().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path == '/metrics.json':
+            body = json.dumps(registry.snapshot()).encode('utf-8')
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would flood the Streamlit console
+
+
+def start_metrics_server(port=DEFAULT_PORT, host='127.0.0.1'):
+    """Serve /metrics (Prometheus text) and /metrics.json in the background
+
+    One server per process; later calls return the running one. Bind
+    errors (e.g. another worker already owns the port) return None.
+    """
+    global _server
+
+    if _server is None:
+        with _server_lock:
+            if _server is None:
+                try:
+                    server = ThreadingHTTPServer((host, port), MetricsHandler)
+                except OSError:
+                    return None
+                server.daemon_threads = True
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+                _server = server
+    return _server
@@ -0,0 +1,202 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+from paths import DEFAULT_CACHE_DIR
+from ttl_cache import TTLCache
+
+DEFAULT_DB_PATH = os.path.join(DEFAULT_CACHE_DIR, 'nutrition_cache.sqlite3')
+
+MEMORY_TTL_SECONDS = 6 * 3600        # Tier one: per-process LRU
+DISK_TTL_SECONDS = 30 * 24 * 3600    # Tier two: shared on-disk store
+EVICTION_INTERVAL = 64               # Check disk size every N writes
+ACCESS_REFRESH_SECONDS = 24 * 3600   # Disk hits only re-stamp accessed_at this stale
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+class NutritionCache:
+    """Two-tier nutrition cache keyed by LogMeal food_id
+
+    Tier one is an in-process LRU with TTL. Tier two is a SQLite database in
+    WAL mode, so it survives Streamlit restarts and is shared by every
+    worker process pointing at the same file.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, max_memory_entries=2048,
+                 max_disk_entries=50000, memory_ttl=MEMORY_TTL_SECONDS,
+                 disk_ttl=DISK_TTL_SECONDS):
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+        self.disk_ttl = disk_ttl
+        self.memory = TTLCache(max_entries=max_memory_entries, ttl_seconds=memory_ttl)
+
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'writes': 0}
+        self._lock = threading.Lock()
+        self._conn = self.connect()
+
+    def connect(self):
+        """Open the on-disk store and make sure the schema exists"""
+        if self.db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+
+        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS nutrition (
+                food_id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        ''')
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_nutrition_accessed ON nutrition (accessed_at)'
+        )
+        conn.commit()
+        return conn
+
+    def get(self, food_id):
+        """Return cached nutrition facts for food_id, or None on a miss"""
+        key = str(food_id)
+
+        nutrition = self.memory.get(key)
+        if nutrition is not None:
+            self._count('memory_hits')
+            return nutrition
+
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT payload, accessed_at FROM nutrition WHERE food_id = ? AND fetched_at >= ?',
+                (key, now - self.disk_ttl)
+            ).fetchone()
+
+            # LRU order only needs day granularity - skip the write + commit
+            # on most hits
+            if row is not None and now - row[1] >= ACCESS_REFRESH_SECONDS:
+                self._conn.execute(
+                    'UPDATE nutrition SET accessed_at = ? WHERE food_id = ?', (now, key)
+                )
+                self._conn.commit()
+
+        if row is None:
+            self._count('misses')
+            return None
+
+        nutrition = json.loads(row[0])
+        self.memory.put(key, nutrition)
+        self._count('disk_hits')
+        return nutrition
+
+    def put(self, food_id, nutrition):
+        """Store nutrition facts in both tiers"""
+        self.put_many([(food_id, nutrition)])
+
+    def put_many(self, entries):
+        """Store several (food_id, nutrition) pairs in one transaction"""
+        now = time.time()
+        rows = []
+        for food_id, nutrition in entries:
+            key = str(food_id)
+            self.memory.put(key, nutrition)
+            rows.append((key, json.dumps(nutrition), now, now))
+
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO nutrition (food_id, payload, fetched_at, accessed_at) '
+                'VALUES (?, ?, ?, ?)',
+                rows
+            )
+            self._conn.commit()
+
+            writes_before = self.stats['writes']
+            self.stats['writes'] += len(rows)
+            if writes_before // EVICTION_INTERVAL != self.stats['writes'] // EVICTION_INTERVAL:
+                self._evict()
+
+    def _evict(self):
+        """Drop expired rows and trim the disk tier to max_disk_entries (LRU)"""
+        self._conn.execute(
+            'DELETE FROM nutrition WHERE fetched_at < ?', (time.time() - self.disk_ttl,)
+        )
+        self._conn.execute(
+            'DELETE FROM nutrition WHERE food_id IN ('
+            'SELECT food_id FROM nutrition ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_disk_entries,)
+        )
+        self._conn.commit()
+
+    def warm_from_json(self, path):
+        """Pre-warm the cache from a JSON dump
+
+        Accepts either {food_id: nutrition} or a list of nutrition dicts that
+        each carry a 'food_id' key. Returns the number of entries loaded.
+        """
+        with open(path, 'r') as f:
+            data = json.load(f)
+
+        if isinstance(data, dict):
+            entries = list(data.items())
+        else:
+            entries = [(item['food_id'], item) for item in data if 'food_id' in item]
+
+        self.put_many(entries)
+        return len(entries)
+
+    def dump_to_json(self, path):
+        """Write every live disk entry to a JSON dump usable by warm_from_json"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT food_id, payload FROM nutrition WHERE fetched_at >= ?',
+                (time.time() - self.disk_ttl,)
+            ).fetchall()
+
+        with open(path, 'w') as f:
+            json.dump({food_id: json.loads(payload) for food_id, payload in rows}, f)
+        return len(rows)
+
+    def get_stats(self):
+        """Hit/miss counters and hit rate across both tiers"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['disk_entries'] = self._conn.execute(
+                'SELECT COUNT(*) FROM nutrition'
+            ).fetchone()[0]
+
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['memory_entries'] = len(self.memory)
+        stats['hit_rate'] = (
+            (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        )
+        return stats
+
+    def clear(self):
+        self.memory.clear()
+        with self._lock:
+            self._conn.execute('DELETE FROM nutrition')
+            self._conn.commit()
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+        metrics.increment(metrics.CACHE_LOOKUPS, cache='nutrition', result=stat)
+
+
+def get_nutrition_cache():
+    """Return the process-wide nutrition cache, creating it on first use"""
+    global _shared_cache
+
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = NutritionCache()
+    return _shared_cache
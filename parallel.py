@@ -0,0 +1,98 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_MAX_WORKERS = 6
+
+
+def map_bounded(func, items, max_workers=DEFAULT_MAX_WORKERS, deadline=None,
+                return_exceptions=False):
+    """Run func over items on a bounded thread pool, keeping input order
+
+    Returns a list aligned with items. Entries whose call raised or did not
+    finish within the overall deadline (seconds) are None, so one slow item
+    cannot hold up the rest. With return_exceptions they hold the raised
+    exception, or a TimeoutError past the deadline, so callers can tell a
+    failure from a None result.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    results = [None] * len(items)
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(items)))
+
+    try:
+        futures = {
+            executor.submit(func, item): index
+            for index, item in enumerate(items)
+        }
+        done, not_done = wait(futures, timeout=deadline)
+
+        for future in done:
+            if future.exception() is None:
+                results[futures[future]] = future.result()
+            elif return_exceptions:
+                results[futures[future]] = future.exception()
+
+        for future in not_done:
+            future.cancel()
+            if return_exceptions:
+                results[futures[future]] = TimeoutError(f"Not finished within {deadline}s")
+    finally:
+        # Don't block on stragglers - their own per-call timeout ends them
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
+
+
+def imap_bounded(func, items, max_workers=DEFAULT_MAX_WORKERS, ordered=True):
+    """Stream func over items on a bounded thread pool
+
+    Yields (index, item, result, error, elapsed_ms) as calls finish - in
+    input order when ordered, otherwise in completion order. Items are
+    pulled from the iterable lazily, so at most 2 * max_workers are held
+    in memory at once.
+    """
+    def timed_call(item):
+        started = time.perf_counter()
+        try:
+            result, error = func(item), None
+        except Exception as e:
+            result, error = None, e
+        return result, error, (time.perf_counter() - started) * 1000
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    source = enumerate(items)
+    max_in_flight = max_workers * 2
+    pending = {}
+    finished = {}
+    next_index = 0
+
+    def submit_more():
+        if len(pending) + len(finished) >= max_in_flight:
+            return
+        for index, item in source:
+            pending[executor.submit(timed_call, item)] = (index, item)
+            if len(pending) + len(finished) >= max_in_flight:
+                break
+
+    try:
+        submit_more()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                index, item = pending.pop(future)
+                outcome = (index, item) + future.result()
+                if ordered:
+                    finished[index] = outcome
+                else:
+                    yield outcome
+
+            while next_index in finished:
+                yield finished.pop(next_index)
+                next_index += 1
+
+            submit_more()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
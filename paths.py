@@ -0,0 +1,7 @@
+import os
+
+# Root of every on-disk store and cache (SQLite files, profiles);
+# WELLSYNC_CACHE_DIR points all Streamlit workers at one shared location
+DEFAULT_CACHE_DIR = os.environ.get(
+    'WELLSYNC_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.wellsync')
+)
@@ -0,0 +1,304 @@
+import atexit
+import json
+import marshal
+import os
+import statistics
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import metrics
+from paths import DEFAULT_CACHE_DIR
+
+# WELLSYNC_PROFILE=1 profiles every rerun into the default directory;
+# any other non-false value is taken as the output directory
+_setting = os.environ.get('WELLSYNC_PROFILE', '')
+ENABLED = _setting.lower() not in ('', '0', 'false', 'no', 'off')
+DEFAULT_PROFILE_DIR = os.path.join(DEFAULT_CACHE_DIR, 'profiles')
+PROFILE_DIR = DEFAULT_PROFILE_DIR if _setting.lower() in ('1', 'true', 'yes', 'on') else _setting
+
+PANDAS_CONSTRUCTORS = {'__init__', 'from_dict', 'from_records'}
+
+# Collapsed-stack walk limits; deeper or smaller paths are folded away
+MAX_STACK_DEPTH = 64
+MIN_PATH_SECONDS = 0.0001
+
+# Files are rewritten after this many reruns or seconds, and at exit
+FLUSH_EVERY_RERUNS = 20
+FLUSH_INTERVAL_SECONDS = 30
+
+_shared_profiler = None
+_shared_profiler_lock = threading.Lock()
+
+
+def is_session_state(func):
+    return f"{os.sep}streamlit{os.sep}runtime{os.sep}state{os.sep}" in func[0]
+
+
+def is_pandas_frame(func):
+    return (func[0].endswith(os.path.join('pandas', 'core', 'frame.py'))
+            and func[2] in PANDAS_CONSTRUCTORS)
+
+
+CATEGORIES = {
+    'session_state': is_session_state,
+    'pandas_frames': is_pandas_frame
+}
+
+
+def is_page(func):
+    """WellSyncSmartApp page renderers, by the main.py naming convention"""
+    filename, _, name = func
+    return (os.path.basename(filename) == 'main.py' and name.startswith('render_')
+            and (name.endswith('_page') or name == 'render_permission_screen'))
+
+
+def category_seconds(stats, matches):
+    """Time spent inside matching functions, counted at the outermost call
+
+    Sums the cumulative time of calls into the category from code outside
+    it, so nested matches (e.g. session state helpers calling each other)
+    aren't counted twice.
+    """
+    total = 0.0
+    for func, (_, _, _, cumulative, callers) in stats.stats.items():
+        if not matches(func):
+            continue
+        if not callers:
+            total += cumulative
+        for caller, edge in callers.items():
+            if not matches(caller):
+                total += edge[3]
+    return total
+
+
+def frame_label(func):
+    filename, line, name = func
+    if filename == '~':
+        label = name  # Built-ins, e.g. <method 'execute' of 'sqlite3.Connection' objects>
+    else:
+        label = f"{os.path.basename(filename)}:{name}:{line}"
+    return label.replace(';', ',').replace(' ', '_')
+
+
+def collapsed_stacks(stats):
+    """Folded stacks ('a;b;c' -> microseconds) from a profile's call graph
+
+    cProfile keeps caller/callee edges rather than stacks, so each
+    function's own time is split across call paths in proportion to the
+    time each edge contributed, the same approximation flameprof uses.
+    """
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    folded = Counter()
+
+    def walk(func, path, share):
+        _, _, own, cumulative, _ = stats.stats[func]
+        path = path + (frame_label(func),)
+        if own * share > 0:
+            folded[';'.join(path)] += own * share * 1e6
+
+        if len(path) >= MAX_STACK_DEPTH:
+            return
+        for callee, edge_cumulative in callees.get(func, ()):
+            callee_cumulative = stats.stats[callee][3]
+            if callee_cumulative <= 0 or frame_label(callee) in path:
+                continue  # Recursion is folded into the outer frame
+            callee_share = share * min(1.0, edge_cumulative / callee_cumulative)
+            if callee_cumulative * callee_share >= MIN_PATH_SECONDS:
+                walk(callee, path, callee_share)
+
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        if not callers:
+            walk(func, (), 1.0)
+
+    return Counter({stack: int(micros) for stack, micros in folded.items() if micros >= 1})
+
+
+def summarize(values):
+    ordered = sorted(values)
+    return {
+        'count': len(ordered),
+        'mean_ms': statistics.fmean(ordered),
+        'p50_ms': ordered[len(ordered) // 2],
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'max_ms': ordered[-1]
+    }
+
+
+class RerunProfiler:
+    """cProfile each Streamlit rerun and keep aggregate results on disk
+
+    Writes to output_dir every flush_every reruns or flush_interval
+    seconds, and at exit:
+      reruns.jsonl        one line per rerun: wall time, page and category ms
+      summary.json        per-page and per-category aggregates
+      wellsync.prof       merged pstats (snakeviz, pstats, gprof2dot)
+      wellsync.collapsed  folded stacks for flamegraph.pl / speedscope
+      top_functions.txt   merged stats sorted by cumulative time
+
+    cProfile only sees the script thread, so the api_calls category is
+    read from the metrics outbound-request timers instead (turned on
+    here): seconds of LogMeal/Fit/OAuth requests that finished during the
+    rerun on any thread, including scan and chunk workers. The timers are
+    process-wide, so other sessions' requests count too - profile with
+    one user.
+    """
+
+    def __init__(self, output_dir=PROFILE_DIR or DEFAULT_PROFILE_DIR, top_functions=60,
+                 flush_every=FLUSH_EVERY_RERUNS, flush_interval=FLUSH_INTERVAL_SECONDS):
+        self.output_dir = output_dir
+        self.top_functions = top_functions
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        os.makedirs(output_dir, exist_ok=True)
+        metrics.set_enabled(True)
+
+        self.stats = None
+        self.folded = Counter()
+        self.wall_ms = []
+        self.page_ms = {}
+        self.category_ms = {name: [] for name in list(CATEGORIES) + ['api_calls']}
+        self.pending = []
+        self.flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def profile_rerun(self):
+        """Context manager profiling one rerun of the calling thread"""
+        return RerunProfile(self)
+
+    def api_seconds(self):
+        """Outbound request seconds recorded so far, process-wide"""
+        return metrics.get_metrics().histogram_sum(metrics.OUTBOUND_SECONDS)
+
+    def record(self, profile, wall_seconds, api_seconds=0.0):
+        """Fold one finished rerun into the aggregates, flushing when due"""
+        import pstats
+
+        stats = pstats.Stats(profile)
+        pages = {
+            func[2]: cumulative * 1000
+            for func, (_, _, _, cumulative, _) in stats.stats.items() if is_page(func)
+        }
+        categories = {
+            name: category_seconds(stats, matches) * 1000
+            for name, matches in CATEGORIES.items()
+        }
+        categories['api_calls'] = api_seconds * 1000
+        rerun = {
+            'at': datetime.now().isoformat(timespec='milliseconds'),
+            'wall_ms': wall_seconds * 1000,
+            'pages': pages,
+            'categories': categories
+        }
+
+        with self._lock:
+            if self.stats is None:
+                self.stats = stats
+            else:
+                self.stats.add(stats)
+            self.folded.update(collapsed_stacks(stats))
+
+            self.wall_ms.append(rerun['wall_ms'])
+            for page, ms in pages.items():
+                self.page_ms.setdefault(page, []).append(ms)
+            for name, ms in categories.items():
+                self.category_ms[name].append(ms)
+
+            self.pending.append(rerun)
+            due = (len(self.pending) >= self.flush_every
+                   or time.monotonic() - self.flushed_at >= self.flush_interval)
+
+        if due:
+            self.flush()
+        return rerun
+
+    def summary(self):
+        return {
+            'reruns': summarize(self.wall_ms),
+            'pages': {page: summarize(values) for page, values in sorted(self.page_ms.items())},
+            'categories': {
+                name: dict(summarize(values), total_ms=sum(values))
+                for name, values in self.category_ms.items() if values
+            }
+        }
+
+    def flush(self):
+        """Write everything recorded so far; files are written outside the lock"""
+        import pstats
+
+        with self._write_lock:
+            with self._lock:
+                if self.stats is None or not self.pending:
+                    return
+                reruns, self.pending = self.pending, []
+                self.flushed_at = time.monotonic()
+                summary = self.summary()
+                folded = sorted(self.folded.items())
+                # Stats.add replaces entries rather than mutating them, so a
+                # shallow copy is a consistent snapshot
+                raw_stats = dict(self.stats.stats)
+
+            with open(os.path.join(self.output_dir, 'reruns.jsonl'), 'a') as f:
+                f.writelines(json.dumps(rerun) + '\n' for rerun in reruns)
+
+            with open(os.path.join(self.output_dir, 'summary.json'), 'w') as f:
+                json.dump(summary, f, indent=2)
+
+            prof_path = os.path.join(self.output_dir, 'wellsync.prof')
+            with open(prof_path, 'wb') as f:
+                marshal.dump(raw_stats, f)  # Same format as Stats.dump_stats
+
+            with open(os.path.join(self.output_dir, 'wellsync.collapsed'), 'w') as f:
+                for stack, micros in folded:
+                    f.write(f"{stack} {micros}\n")
+
+            with open(os.path.join(self.output_dir, 'top_functions.txt'), 'w') as f:
+                pstats.Stats(prof_path, stream=f).sort_stats('cumulative').print_stats(
+                    self.top_functions
+                )
+
+
+class RerunProfile:
+    """One profiled rerun; records even when the script stops early
+
+    st.rerun() and st.stop() end a rerun by raising, so results are
+    recorded on the way out and the exception is left to propagate.
+    """
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    def __enter__(self):
+        import cProfile
+
+        self.profile = cProfile.Profile()
+        self.api_started = self.profiler.api_seconds()
+        self.started = time.perf_counter()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profile.disable()
+        self.profiler.record(
+            self.profile, time.perf_counter() - self.started,
+            max(0.0, self.profiler.api_seconds() - self.api_started)
+        )
+        return False
+
+
+def get_rerun_profiler():
+    """Return the process-wide rerun profiler, creating it on first use"""
+    global _shared_profiler
+
+    if _shared_profiler is None:
+        with _shared_profiler_lock:
+            if _shared_profiler is None:
+                _shared_profiler = RerunProfiler()
+    return _shared_profiler
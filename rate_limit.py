@@ -0,0 +1,153 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+from paths import DEFAULT_CACHE_DIR
+
+DEFAULT_DB_PATH = os.path.join(DEFAULT_CACHE_DIR, 'rate_limits.sqlite3')
+
+# Per-API-key budget: sustained requests per second and burst size
+DEFAULT_RATE = 2.0
+DEFAULT_BURST = 10
+DEFAULT_MAX_WAIT = 2.0  # Seconds a call may wait for a token before it is rejected
+
+_shared_limiter = None
+_shared_limiter_lock = threading.Lock()
+
+
+class RateLimitExceeded(Exception):
+    """Raised instead of calling an API whose quota has no room left
+
+    retry_after is the number of seconds until a request should succeed.
+    Callers should surface it (e.g. "try again shortly") rather than
+    substitute fallback data.
+    """
+
+    def __init__(self, retry_after, message=None):
+        super().__init__(message or f"Rate limit reached - retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """Token buckets stored in SQLite, shared by every thread and process
+
+    Each key (e.g. one per API key) refills at rate tokens per second up
+    to burst. State lives in a WAL-mode database, so all Streamlit workers
+    pointing at the same file draw from the same budget.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, rate=DEFAULT_RATE, burst=DEFAULT_BURST,
+                 max_wait=DEFAULT_MAX_WAIT):
+        self.db_path = db_path
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+
+        self._lock = threading.Lock()
+        self._conn = self.connect()
+
+    def connect(self):
+        """Open the bucket store and make sure the schema exists"""
+        if self.db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+
+        # Autocommit mode - transactions are opened explicitly with BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False,
+                               isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                bucket TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        return conn
+
+    def try_acquire(self, bucket, tokens=1):
+        """Take tokens from bucket if it has them
+
+        Returns 0 on success, otherwise the seconds until enough tokens
+        will have refilled (nothing is taken in that case).
+        """
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front, so the read-
+            # refill-write below is atomic across processes too
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = time.time()
+                row = self._conn.execute(
+                    'SELECT tokens, updated_at FROM rate_buckets WHERE bucket = ?', (bucket,)
+                ).fetchone()
+
+                if row is None:
+                    available = float(self.burst)
+                else:
+                    available = min(self.burst, row[0] + max(0.0, now - row[1]) * self.rate)
+
+                if available >= tokens:
+                    available -= tokens
+                    wait = 0.0
+                else:
+                    wait = (tokens - available) / self.rate
+
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO rate_buckets (bucket, tokens, updated_at) '
+                    'VALUES (?, ?, ?)',
+                    (bucket, available, now)
+                )
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        return wait
+
+    def acquire(self, bucket, tokens=1, max_wait=None):
+        """Take tokens, waiting up to max_wait seconds for a refill
+
+        Raises RateLimitExceeded when the bucket can't refill in time.
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+
+        while True:
+            wait = self.try_acquire(bucket, tokens)
+            if wait == 0:
+                return
+
+            if wait > deadline - time.monotonic():
+                metrics.increment(metrics.RATE_LIMITED, bucket=bucket.split(':')[0])
+                raise RateLimitExceeded(wait)
+            time.sleep(wait)
+
+    def reset(self, bucket):
+        with self._lock:
+            self._conn.execute('DELETE FROM rate_buckets WHERE bucket = ?', (bucket,))
+
+
+def api_key_bucket(service, api_key):
+    """Bucket name for one API key; the key itself is never stored"""
+    return f"{service}:{hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]}"
+
+
+def retry_after_seconds(response, default=1.0):
+    """Seconds from a 429 response's Retry-After header, else default"""
+    try:
+        return max(0.0, float(response.headers.get('Retry-After')))
+    except (TypeError, ValueError):
+        return default
+
+
+def get_rate_limiter():
+    """Return the process-wide rate limiter, creating it on first use"""
+    global _shared_limiter
+
+    if _shared_limiter is None:
+        with _shared_limiter_lock:
+            if _shared_limiter is None:
+                _shared_limiter = RateLimiter()
+    return _shared_limiter
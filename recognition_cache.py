@@ -0,0 +1,112 @@
+import hashlib
+import io
+import threading
+from collections import namedtuple
+
+import metrics
+from ttl_cache import TTLCache
+
+ImageKey = namedtuple('ImageKey', ['digest', 'phash'])
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def content_hash(image_bytes):
+    """Fast content hash of the raw image bytes"""
+    return hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+
+
+def perceptual_hash(image_bytes, hash_size=8):
+    """64-bit difference hash (dHash), or None if the bytes aren't an image
+
+    Re-encoded or slightly re-compressed copies of the same frame land
+    within a few bits of each other.
+    """
+    from PIL import Image
+
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        image.draft('L', (hash_size * 8, hash_size * 8))  # Cheap JPEG downscale on decode
+        pixels = list(
+            image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR).getdata()
+        )
+    except Exception:
+        return None
+
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+class RecognitionCache:
+    """Content-addressed cache of LogMeal /recognition/complete responses
+
+    Entries are keyed by a hash of the image bytes; with use_perceptual_hash
+    near-identical frames (within max_distance bits of dHash) also match.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=3600,
+                 use_perceptual_hash=False, max_distance=4):
+        self.use_perceptual_hash = use_perceptual_hash
+        self.max_distance = max_distance
+        self.entries = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.stats = {'hits': 0, 'perceptual_hits': 0, 'misses': 0}
+        self._lock = threading.Lock()
+
+    def make_key(self, image_bytes):
+        """Hash an image once so the key can be reused for get and put"""
+        phash = perceptual_hash(image_bytes) if self.use_perceptual_hash else None
+        return ImageKey(content_hash(image_bytes), phash)
+
+    def get(self, key):
+        """Return the cached recognition response for key, or None"""
+        result = self.entries.get(key.digest)
+        if result is not None:
+            self._count('hits')
+            return result[1]
+
+        if key.phash is not None:
+            for _, (phash, cached) in self.entries.items():
+                if phash is not None and bin(phash ^ key.phash).count('1') <= self.max_distance:
+                    self._count('perceptual_hits')
+                    return cached
+
+        self._count('misses')
+        return None
+
+    def put(self, key, recognition_data):
+        self.entries.put(key.digest, (key.phash, recognition_data))
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+
+        lookups = stats['hits'] + stats['perceptual_hits'] + stats['misses']
+        stats['entries'] = len(self.entries)
+        stats['hit_rate'] = (
+            (stats['hits'] + stats['perceptual_hits']) / lookups if lookups else 0.0
+        )
+        return stats
+
+    def clear(self):
+        self.entries.clear()
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+        metrics.increment(metrics.CACHE_LOOKUPS, cache='recognition', result=stat)
+
+
+def get_recognition_cache():
+    """Return the process-wide recognition cache, creating it on first use"""
+    global _shared_cache
+
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = RecognitionCache()
+    return _shared_cache
@@ -0,0 +1,57 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+DEFAULT_MAX_WORKERS = 4
+MAX_JOBS_PER_SESSION = 8
+
+# Reruns while a scan is in flight: first after POLL_SECONDS, then each
+# wait POLL_BACKOFF times longer, up to MAX_POLL_SECONDS
+POLL_SECONDS = 0.5
+POLL_BACKOFF = 1.5
+MAX_POLL_SECONDS = 3.0
+
+_shared_executor = None
+_shared_executor_lock = threading.Lock()
+
+
+def get_scan_executor():
+    """Return the process-wide executor food scans run on"""
+    global _shared_executor
+
+    if _shared_executor is None:
+        with _shared_executor_lock:
+            if _shared_executor is None:
+                _shared_executor = ThreadPoolExecutor(
+                    max_workers=DEFAULT_MAX_WORKERS, thread_name_prefix='wellsync-scan'
+                )
+    return _shared_executor
+
+
+def submit_scan(jobs, key, func, *args):
+    """Start func(*args) in the background unless jobs already has key
+
+    jobs is a per-session dict of key -> Future (e.g. in st.session_state),
+    so reruns for the same photo pick up the running or finished job instead
+    of starting another. func runs off the script thread and must not call
+    Streamlit. Only the newest MAX_JOBS_PER_SESSION jobs are kept.
+    """
+    future = jobs.get(key)
+    if future is None:
+        future = get_scan_executor().submit(func, *args)
+        jobs[key] = future
+
+        while len(jobs) > MAX_JOBS_PER_SESSION:
+            jobs.pop(next(iter(jobs)))
+    return future
+
+
+def wait_for_scan(future, polls):
+    """Block until future finishes or the polls-th backoff delay passes
+
+    polls counts earlier waits on the same scan. Returns as soon as the
+    scan is done, so backing off never delays showing the result - it only
+    means a slow scan reruns the page less often. Returns future.done().
+    """
+    delay = min(MAX_POLL_SECONDS, POLL_SECONDS * POLL_BACKOFF ** polls)
+    wait([future], timeout=delay)
+    return future.done()
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+import metrics
+
+_shared_single_flight = None
+_shared_single_flight_lock = threading.Lock()
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution
+
+    Keys are tuples starting with the kind of call, e.g.
+    ('nutrition', base_url, food_id). The first caller for a key runs the
+    function; callers arriving while it is in flight wait for and share
+    its result or exception. Once it finishes the key is free again, so
+    results aren't cached here. Coroutine callers use do_async, which
+    shares the same keys with do.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def join(self, key):
+        """(future, leader) for key; leader is True if the caller must run it"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                metrics.increment(metrics.COALESCED, kind=key[0])
+                return future, False
+
+            future = self._calls[key] = Future()
+            # Running futures can't be cancelled by a waiter giving up
+            future.set_running_or_notify_cancel()
+            return future, True
+
+    def do(self, key, func, *args):
+        future, leader = self.join(key)
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    async def do_async(self, key, func, *args):
+        """Like do, for a coroutine function; waiting never blocks the loop"""
+        future, leader = self.join(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+
+        try:
+            result = await func(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+def get_single_flight():
+    """Return the process-wide coalescer shared by the LogMeal clients"""
+    global _shared_single_flight
+
+    if _shared_single_flight is None:
+        with _shared_single_flight_lock:
+            if _shared_single_flight is None:
+                _shared_single_flight = SingleFlight()
+    return _shared_single_flight
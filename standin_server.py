@@ -0,0 +1,350 @@
+"""Local stand-in for the LogMeal and Google Fit endpoints the clients use
+
+Serves, from one ThreadingHTTPServer:
+  POST /v2/recognition/complete                        LogMeal recognition
+  GET|POST /v2/nutrition/recipe/nutritionalInfo        LogMeal nutrition
+  POST /fitness/v1/users/{userId}/dataset:aggregate    Fitness aggregate
+
+with configurable latency distributions, error rates and payload sizes,
+so scan and sync paths can be benchmarked without a network. Point the
+clients at it with base_url / fit_root_url, or the LOGMEAL_BASE_URL and
+GOOGLE_FIT_ROOT_URL environment variables.
+
+    python standin_server.py --port 8765 --latency lognormal:80:0.5 --error-rate 0.02
+"""
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from zoneinfo import ZoneInfo
+
+DAY_MILLIS = 86400000
+
+FOOD_NAMES = [
+    'Grilled Chicken Breast', 'Brown Rice', 'Steamed Broccoli', 'Salmon Fillet',
+    'Quinoa', 'Mixed Vegetables', 'Turkey Sandwich', 'Avocado', 'Greek Yogurt',
+    'Banana', 'Oatmeal', 'Scrambled Eggs'
+]
+
+AGGREGATE_PATH = re.compile(r'^/fitness/v1/users/([^/]+)/dataset:aggregate$')
+
+
+def parse_latency(spec):
+    """Latency sampler (returns seconds) from a spec string
+
+    'none', 'fixed:MS', 'uniform:LOW_MS:HIGH_MS' or
+    'lognormal:MEDIAN_MS:SIGMA' (long right tail, like real APIs).
+    """
+    kind, *params = spec.split(':')
+    params = [float(param) for param in params]
+
+    if kind == 'none':
+        return lambda rng: 0.0
+    if kind == 'fixed':
+        return lambda rng: params[0] / 1000
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(params[0], params[1]) / 1000
+    if kind == 'lognormal':
+        mu, sigma = math.log(params[0]), params[1]
+        return lambda rng: rng.lognormvariate(mu, sigma) / 1000
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+class StandInConfig:
+    """Behaviour knobs for one endpoint family
+
+    latency is a parse_latency spec; error_rate is the fraction of requests
+    answered with error_status instead of a payload.
+    """
+
+    def __init__(self, latency='none', error_rate=0.0, error_status=503):
+        self.latency = latency
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Threaded stand-in server; use as a context manager or start()/stop()
+
+    foods_per_image sets recognition payload size; points_per_dataset sets
+    how many points each aggregate bucket carries per data type.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, recognition=None, nutrition=None, fit=None,
+                 foods_per_image=3, points_per_dataset=1, seed=0):
+        super().__init__(('127.0.0.1', port), StandInHandler)
+        self.configs = {
+            'recognition': recognition or StandInConfig(),
+            'nutrition': nutrition or StandInConfig(),
+            'fit': fit or StandInConfig()
+        }
+        self.foods_per_image = foods_per_image
+        self.points_per_dataset = points_per_dataset
+
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {name: {'requests': 0, 'errors': 0} for name in self.configs}
+        self._thread = None
+
+    @property
+    def logmeal_base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v2"
+
+    @property
+    def fit_root_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def handle_error(self, request, client_address):
+        # Clients hang up on purpose (deadlines, cancelled hedges)
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def random(self):
+        """A fresh RNG per request, seeded from the server's (thread-safe)"""
+        with self._rng_lock:
+            return random.Random(self._rng.getrandbits(64))
+
+    def record(self, endpoint, error):
+        with self._stats_lock:
+            self.stats[endpoint]['requests'] += 1
+            self.stats[endpoint]['errors'] += int(error)
+
+    def recognition_payload(self, rng):
+        foods = rng.sample(FOOD_NAMES, min(self.foods_per_image, len(FOOD_NAMES)))
+        return {
+            'imageId': rng.getrandbits(31),
+            'recognition_results': [
+                {
+                    'food_id': f"{name.lower().replace(' ', '_')}_{FOOD_NAMES.index(name)}",
+                    'name': name,
+                    'prob': round(rng.uniform(0.6, 0.98), 3)
+                }
+                for name in foods
+            ]
+        }
+
+    def nutrition_payload(self, food_id):
+        # Deterministic per food_id, like the real nutrition database
+        rng = random.Random(food_id)
+        return {
+            'food_id': food_id,
+            'calories': round(rng.uniform(80, 450), 1),
+            'protein': round(rng.uniform(1, 35), 1),
+            'carbs': round(rng.uniform(0, 60), 1),
+            'fat': round(rng.uniform(0, 25), 1),
+            'fiber': round(rng.uniform(0, 10), 1),
+            'sugar': round(rng.uniform(0, 20), 1),
+            'sodium': round(rng.uniform(0, 900), 1)
+        }
+
+    def bucket_bounds(self, body):
+        """(start, end) millis of each bucket: fixed durationMillis, or calendar periods"""
+        start_millis = int(body['startTimeMillis'])
+        end_millis = int(body['endTimeMillis'])
+        bucket_by_time = body.get('bucketByTime', {})
+        period = bucket_by_time.get('period')
+
+        if period is None:
+            bucket_millis = int(bucket_by_time.get('durationMillis', DAY_MILLIS))
+            return [
+                (bucket_start, min(bucket_start + bucket_millis, end_millis))
+                for bucket_start in range(start_millis, end_millis, bucket_millis)
+            ]
+
+        # Wall-clock days (or weeks) in the zone, so DST days are 23h or 25h
+        days = int(period.get('value', 1)) * (7 if period.get('type') == 'week' else 1)
+        boundary = datetime.fromtimestamp(start_millis / 1000, ZoneInfo(period.get('timeZoneId', 'UTC')))
+        bounds = []
+        bucket_start = start_millis
+        while bucket_start < end_millis:
+            boundary += timedelta(days=days)
+            bucket_end = min(round(boundary.timestamp() * 1000), end_millis)
+            bounds.append((bucket_start, bucket_end))
+            bucket_start = bucket_end
+        return bounds
+
+    def aggregate_payload(self, body, rng):
+        data_types = [entry['dataTypeName'] for entry in body.get('aggregateBy', [])]
+        points = self.points_per_dataset
+
+        buckets = []
+        for bucket_start, bucket_end in self.bucket_bounds(body):
+            step = (bucket_end - bucket_start) // points
+
+            datasets = []
+            for data_type in data_types:
+                if 'sleep' in data_type:
+                    # One night-long segment per day
+                    night_nanos = int(rng.uniform(6.0, 9.0) * 3600 * 1e9)
+                    spans = [(bucket_start * 1_000_000, bucket_start * 1_000_000 + night_nanos)]
+                else:
+                    spans = [
+                        ((bucket_start + i * step) * 1_000_000,
+                         (bucket_start + (i + 1) * step) * 1_000_000)
+                        for i in range(points)
+                    ]
+
+                point_list = [
+                    {
+                        'startTimeNanos': str(span_start),
+                        'endTimeNanos': str(span_end),
+                        'dataTypeName': data_type,
+                        'value': [self.point_value(data_type, points, rng)]
+                    }
+                    for span_start, span_end in spans
+                ]
+                datasets.append({
+                    'dataSourceId': f"derived:{data_type}:com.google.android.gms:aggregated",
+                    'point': point_list
+                })
+
+            buckets.append({
+                'startTimeMillis': str(bucket_start),
+                'endTimeMillis': str(bucket_end),
+                'dataset': datasets
+            })
+
+        return {'bucket': buckets}
+
+    def point_value(self, data_type, points, rng):
+        if 'sleep' in data_type:
+            return {'intVal': 4}  # Sleep stage: light sleep
+        if 'step_count' in data_type:
+            return {'intVal': rng.randint(4000, 14000) // points}
+        if 'active_minutes' in data_type:
+            return {'intVal': rng.randint(10, 110) // points}
+        if 'calories' in data_type:
+            return {'fpVal': rng.uniform(1800, 2800) / points}
+        return {'fpVal': rng.uniform(58, 85)}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real hosts
+    # Headers and body go out as separate writes; with Nagle on, the body
+    # waits for the client's delayed ACK (~40 ms) on a kept-alive connection
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.dispatch()
+
+    def do_POST(self):
+        self.dispatch()
+
+    def dispatch(self):
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+
+        if url.path == '/v2/recognition/complete':
+            endpoint = 'recognition'
+        elif url.path == '/v2/nutrition/recipe/nutritionalInfo':
+            endpoint = 'nutrition'
+        elif AGGREGATE_PATH.match(url.path):
+            endpoint = 'fit'
+        else:
+            self.send_json(404, {'error': f"No stand-in for {url.path}"})
+            return
+
+        server = self.server
+        config = server.configs[endpoint]
+        rng = server.random()
+
+        time.sleep(config.sample_latency(rng))
+
+        failed = rng.random() < config.error_rate
+        server.record(endpoint, failed)
+        if failed:
+            self.send_json(config.error_status, {'error': 'injected failure'})
+            return
+
+        if endpoint == 'recognition':
+            payload = server.recognition_payload(rng)
+        elif endpoint == 'nutrition':
+            params = parse_qs(url.query)
+            food_id = params.get('food_id', [''])[0]
+            if not food_id and body:
+                food_id = str(json.loads(body).get('food_id', ''))
+            payload = server.nutrition_payload(food_id)
+        else:
+            payload = server.aggregate_payload(json.loads(body or b'{}'), rng)
+
+        self.send_json(200, payload)
+
+    def send_json(self, status, payload):
+        content = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', default='lognormal:80:0.5',
+                        help="default latency spec for every endpoint")
+    parser.add_argument('--recognition-latency', default=None)
+    parser.add_argument('--nutrition-latency', default=None)
+    parser.add_argument('--fit-latency', default=None)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--foods-per-image', type=int, default=3)
+    parser.add_argument('--points-per-dataset', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    def config(latency):
+        return StandInConfig(latency or args.latency, args.error_rate, args.error_status)
+
+    server = StandInServer(
+        port=args.port,
+        recognition=config(args.recognition_latency),
+        nutrition=config(args.nutrition_latency),
+        fit=config(args.fit_latency),
+        foods_per_image=args.foods_per_image,
+        points_per_dataset=args.points_per_dataset,
+        seed=args.seed
+    )
+
+    print(f"export LOGMEAL_BASE_URL={server.logmeal_base_url}")
+    print(f"export GOOGLE_FIT_ROOT_URL={server.fit_root_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
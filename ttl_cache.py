@@ -0,0 +1,55 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe in-process LRU cache with per-entry time-to-live"""
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, ttl_seconds=None):
+        """Store a value, evicting the least recently used entry when full"""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def items(self):
+        """Snapshot of live (key, value) pairs, most recently used last"""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (key, value) for key, (expires_at, value) in self._entries.items()
+                if expires_at >= now
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
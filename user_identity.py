@@ -0,0 +1,68 @@
+import hashlib
+import re
+import uuid
+
+import streamlit as st
+
+# Stored meals and Fit syncs are keyed by these ids; they must survive
+# reloads and new sessions, or earlier data is orphaned
+GOOGLE_PREFIX = 'google:'
+ANONYMOUS_PREFIX = 'anon:'
+
+# Page URL parameter that carries an anonymous visitor's id
+ANONYMOUS_PARAM = 'uid'
+ANONYMOUS_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+
+def google_user_id(credentials_info):
+    """Stable id for the Google account behind stored OAuth credentials
+
+    Uses the account's OpenID subject when the token exchange returned one,
+    else the refresh token; only a hash of either is kept. None if neither.
+    """
+    account = credentials_info.get('account_id') or credentials_info.get('refresh_token')
+    if not account:
+        return None
+    return GOOGLE_PREFIX + hashlib.sha256(account.encode('utf-8')).hexdigest()[:32]
+
+
+def get_query_param(name):
+    """Value of a page URL parameter (None if absent)"""
+    if hasattr(st, 'query_params'):
+        return st.query_params.get(name)
+    values = st.experimental_get_query_params().get(name)
+    return values[0] if values else None
+
+
+def set_query_param(name, value):
+    """Set a page URL parameter, keeping the others"""
+    if hasattr(st, 'query_params'):
+        st.query_params[name] = value
+    else:
+        params = st.experimental_get_query_params()
+        params[name] = value
+        st.experimental_set_query_params(**params)
+
+
+def anonymous_user_id():
+    """Id for a visitor who hasn't connected Google Fit
+
+    Kept in the page URL, so reloading or bookmarking the page returns to
+    the same meal log; a missing or malformed id starts a new one.
+    """
+    anonymous_id = get_query_param(ANONYMOUS_PARAM)
+    if not anonymous_id or not ANONYMOUS_ID_PATTERN.fullmatch(anonymous_id):
+        anonymous_id = uuid.uuid4().hex
+        set_query_param(ANONYMOUS_PARAM, anonymous_id)
+    return ANONYMOUS_PREFIX + anonymous_id
+
+
+def resolve_user_id():
+    """Stable id for the current visitor: their Google account when
+    connected, otherwise the anonymous id from the page URL"""
+    credentials_info = st.session_state.get('google_fit_credentials')
+    if credentials_info:
+        user_id = google_user_id(credentials_info)
+        if user_id:
+            return user_id
+    return anonymous_user_id()